@@ -0,0 +1,33 @@
+"""Store order money as numeric
+
+Revision ID: 4d8f1b6e2a93
+Revises: 9e4b2c7d1a58
+Create Date: 2026-10-18 19:41:12.503861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8f1b6e2a93'
+down_revision: Union[str, None] = '9e4b2c7d1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Integer columns truncated or rounded the cents of catalog prices
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.alter_column('amount', type_=sa.DECIMAL(10, 2), existing_type=sa.Integer(), existing_nullable=True)
+    with op.batch_alter_table('orderItems') as batch_op:
+        batch_op.alter_column('price', type_=sa.DECIMAL(10, 2), existing_type=sa.Integer(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orderItems') as batch_op:
+        batch_op.alter_column('price', type_=sa.Integer(), existing_type=sa.DECIMAL(10, 2), existing_nullable=False)
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.alter_column('amount', type_=sa.Integer(), existing_type=sa.DECIMAL(10, 2), existing_nullable=True)
@@ -0,0 +1,27 @@
+"""Index auth session revocations
+
+Revision ID: 7b3e9f2a6c14
+Revises: 4d8f1b6e2a93
+Create Date: 2026-10-18 20:35:48.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9f2a6c14'
+down_revision: Union[str, None] = '4d8f1b6e2a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The revocation refresher prunes rotated sessions by revoked_at
+    op.create_index(op.f('ix_auth_sessions_revoked_at'), 'auth_sessions', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_auth_sessions_revoked_at'), table_name='auth_sessions')
@@ -0,0 +1,51 @@
+"""Add foreign key indexes
+
+Revision ID: 8a3e6b21c4f9
+Revises: 5c1f0a9d2e47
+Create Date: 2026-10-18 10:03:57.640512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3e6b21c4f9'
+down_revision: Union[str, None] = '5c1f0a9d2e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_farmers_user_id'), 'farmers', ['user_id'], unique=False)
+    op.create_index(op.f('ix_buyers_user_id'), 'buyers', ['user_id'], unique=False)
+    op.create_index(op.f('ix_products_farmer_id'), 'products', ['farmer_id'], unique=False)
+    op.create_index(op.f('ix_products_category_id'), 'products', ['category_id'], unique=False)
+    op.create_index('ix_products_in_stock', 'products', ['id'], unique=False,
+                    postgresql_where=sa.text('quantity > 0'), sqlite_where=sa.text('quantity > 0'))
+    op.create_index(op.f('ix_orders_buyer_id'), 'orders', ['buyer_id'], unique=False)
+    op.create_index(op.f('ix_orderItems_order_id'), 'orderItems', ['order_id'], unique=False)
+    op.create_index(op.f('ix_orderItems_product_id'), 'orderItems', ['product_id'], unique=False)
+    op.create_index(op.f('ix_payments_order_id'), 'payments', ['order_id'], unique=False)
+    op.create_index(op.f('ix_deliveries_order_id'), 'deliveries', ['order_id'], unique=False)
+    op.create_index('ix_conversations_farmer_id_buyer_id', 'conversations', ['farmer_id', 'buyer_id'], unique=False)
+    op.create_index(op.f('ix_conversations_buyer_id'), 'conversations', ['buyer_id'], unique=False)
+    op.create_index('ix_messages_conversation_id_timestamp', 'messages', ['conversation_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id_timestamp', table_name='messages')
+    op.drop_index(op.f('ix_conversations_buyer_id'), table_name='conversations')
+    op.drop_index('ix_conversations_farmer_id_buyer_id', table_name='conversations')
+    op.drop_index(op.f('ix_deliveries_order_id'), table_name='deliveries')
+    op.drop_index(op.f('ix_payments_order_id'), table_name='payments')
+    op.drop_index(op.f('ix_orderItems_product_id'), table_name='orderItems')
+    op.drop_index(op.f('ix_orderItems_order_id'), table_name='orderItems')
+    op.drop_index(op.f('ix_orders_buyer_id'), table_name='orders')
+    op.drop_index('ix_products_in_stock', table_name='products')
+    op.drop_index(op.f('ix_products_category_id'), table_name='products')
+    op.drop_index(op.f('ix_products_farmer_id'), table_name='products')
+    op.drop_index(op.f('ix_buyers_user_id'), table_name='buyers')
+    op.drop_index(op.f('ix_farmers_user_id'), table_name='farmers')
@@ -0,0 +1,39 @@
+"""Narrow product search update trigger
+
+Revision ID: 9e4b2c7d1a58
+Revises: c6f1d8b3e527
+Create Date: 2026-10-18 19:20:05.412377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2c7d1a58'
+down_revision: Union[str, None] = 'c6f1d8b3e527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _replace_update_trigger(columns: str) -> None:
+    op.execute("DROP TRIGGER IF EXISTS products_fts_au")
+    op.execute(f"""
+        CREATE TRIGGER products_fts_au AFTER UPDATE{columns} ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """)
+
+
+def upgrade() -> None:
+    # Stock decrements and version bumps must not rewrite the FTS row
+    if op.get_bind().dialect.name == 'sqlite':
+        _replace_update_trigger(" OF name, description")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        _replace_update_trigger("")
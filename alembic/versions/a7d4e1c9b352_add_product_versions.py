@@ -0,0 +1,26 @@
+"""Add product versions
+
+Revision ID: a7d4e1c9b352
+Revises: f3c7a9e2d418
+Create Date: 2026-10-18 14:48:09.371562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e1c9b352'
+down_revision: Union[str, None] = 'f3c7a9e2d418'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'version')
@@ -0,0 +1,41 @@
+"""Add token revocations
+
+Revision ID: b8e2f6a4c013
+Revises: a7d4e1c9b352
+Create Date: 2026-10-18 16:12:44.508193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2f6a4c013'
+down_revision: Union[str, None] = 'a7d4e1c9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('token_revocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=64), nullable=True),
+    sa.Column('subject', sa.String(length=100), nullable=True),
+    sa.Column('revoked_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_token_revocations_expires_at'), 'token_revocations', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_token_revocations_id'), 'token_revocations', ['id'], unique=False)
+    op.create_index(op.f('ix_token_revocations_jti'), 'token_revocations', ['jti'], unique=False)
+    op.create_index(op.f('ix_token_revocations_subject'), 'token_revocations', ['subject'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_token_revocations_subject'), table_name='token_revocations')
+    op.drop_index(op.f('ix_token_revocations_jti'), table_name='token_revocations')
+    op.drop_index(op.f('ix_token_revocations_id'), table_name='token_revocations')
+    op.drop_index(op.f('ix_token_revocations_expires_at'), table_name='token_revocations')
+    op.drop_table('token_revocations')
@@ -0,0 +1,43 @@
+"""Add inventory holds
+
+Revision ID: c47d2f8e9b10
+Revises: 8a3e6b21c4f9
+Create Date: 2026-10-18 11:26:14.902377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d2f8e9b10'
+down_revision: Union[str, None] = '8a3e6b21c4f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_holds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_holds_id'), 'inventory_holds', ['id'], unique=False)
+    op.create_index(op.f('ix_inventory_holds_order_id'), 'inventory_holds', ['order_id'], unique=False)
+    op.create_index('ix_inventory_holds_expires_at_held', 'inventory_holds', ['expires_at'], unique=False,
+                    postgresql_where=sa.text("status = 'held'"), sqlite_where=sa.text("status = 'held'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_holds_expires_at_held', table_name='inventory_holds')
+    op.drop_index(op.f('ix_inventory_holds_order_id'), table_name='inventory_holds')
+    op.drop_index(op.f('ix_inventory_holds_id'), table_name='inventory_holds')
+    op.drop_table('inventory_holds')
@@ -0,0 +1,44 @@
+"""Add auth sessions
+
+Revision ID: c6f1d8b3e527
+Revises: b8e2f6a4c013
+Create Date: 2026-10-18 17:03:21.846930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1d8b3e527'
+down_revision: Union[str, None] = 'b8e2f6a4c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('auth_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('family_id', sa.String(length=32), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('revoked_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_auth_sessions_expires_at'), 'auth_sessions', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_auth_sessions_family_id'), 'auth_sessions', ['family_id'], unique=False)
+    op.create_index(op.f('ix_auth_sessions_id'), 'auth_sessions', ['id'], unique=False)
+    op.create_index(op.f('ix_auth_sessions_user_id'), 'auth_sessions', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_auth_sessions_user_id'), table_name='auth_sessions')
+    op.drop_index(op.f('ix_auth_sessions_id'), table_name='auth_sessions')
+    op.drop_index(op.f('ix_auth_sessions_family_id'), table_name='auth_sessions')
+    op.drop_index(op.f('ix_auth_sessions_expires_at'), table_name='auth_sessions')
+    op.drop_table('auth_sessions')
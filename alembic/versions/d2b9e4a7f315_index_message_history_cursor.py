@@ -0,0 +1,28 @@
+"""Index message history cursor
+
+Revision ID: d2b9e4a7f315
+Revises: c47d2f8e9b10
+Create Date: 2026-10-18 12:41:08.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b9e4a7f315'
+down_revision: Union[str, None] = 'c47d2f8e9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_conversation_id_timestamp_id', 'messages', ['conversation_id', 'timestamp', 'id'], unique=False)
+    op.drop_index('ix_messages_conversation_id_timestamp', table_name='messages')
+
+
+def downgrade() -> None:
+    op.create_index('ix_messages_conversation_id_timestamp', 'messages', ['conversation_id', 'timestamp'], unique=False)
+    op.drop_index('ix_messages_conversation_id_timestamp_id', table_name='messages')
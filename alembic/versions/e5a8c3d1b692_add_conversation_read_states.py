@@ -0,0 +1,52 @@
+"""Add conversation read states
+
+Revision ID: e5a8c3d1b692
+Revises: d2b9e4a7f315
+Create Date: 2026-10-18 13:30:52.217845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8c3d1b692'
+down_revision: Union[str, None] = 'd2b9e4a7f315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('conversation_read_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('conversation_id', 'user_id', name='uq_conversation_read_states_conversation_id_user_id')
+    )
+    op.create_index(op.f('ix_conversation_read_states_id'), 'conversation_read_states', ['id'], unique=False)
+    op.create_index(op.f('ix_conversation_read_states_user_id'), 'conversation_read_states', ['user_id'], unique=False)
+
+    # Existing history starts out read for both participants
+    for role_table, role_column in (('buyers', 'buyer_id'), ('farmers', 'farmer_id')):
+        op.execute(f"""
+            INSERT INTO conversation_read_states (conversation_id, user_id, last_read_message_id, unread_count)
+            SELECT conversations.id, {role_table}.user_id,
+                   (SELECT max(messages.id) FROM messages WHERE messages.conversation_id = conversations.id),
+                   0
+            FROM conversations
+            JOIN {role_table} ON {role_table}.id = conversations.{role_column}
+            WHERE {role_table}.user_id IS NOT NULL
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_conversation_read_states_user_id'), table_name='conversation_read_states')
+    op.drop_index(op.f('ix_conversation_read_states_id'), table_name='conversation_read_states')
+    op.drop_table('conversation_read_states')
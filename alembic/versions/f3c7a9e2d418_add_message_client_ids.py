@@ -0,0 +1,28 @@
+"""Add message client ids
+
+Revision ID: f3c7a9e2d418
+Revises: e5a8c3d1b692
+Create Date: 2026-10-18 14:05:37.618204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7a9e2d418'
+down_revision: Union[str, None] = 'e5a8c3d1b692'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('client_message_id', sa.String(length=64), nullable=True))
+    op.create_index('ix_messages_sender_id_client_message_id', 'messages', ['sender_id', 'client_message_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_sender_id_client_message_id', table_name='messages')
+    op.drop_column('messages', 'client_message_id')
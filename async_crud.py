@@ -0,0 +1,24 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import User
+from passwords import HashingOverloadedError, needs_rehash, password_hasher
+
+# Async crud for routers using database.get_async_db. Only what an async router actually calls lives
+# here; everything else stays in crud.py so the two cannot drift apart.
+# AsyncSession cannot lazy-load, so anything a response model walks into has to be loaded eagerly.
+
+# User Operations
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if user is None or not await password_hasher.verify_async(password, user.password):
+        return None
+    if needs_rehash(user.password):
+        try:
+            user.password = await password_hasher.hash_async(password)
+        except HashingOverloadedError:
+            return user
+        await db.commit()
+    return user
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email).limit(1))
@@ -0,0 +1,167 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Product, Category
+
+# In-process typeahead over product and category names.
+# Prefix lookups bisect a sorted token list; trigrams catch infix matches and small typos.
+# The index is per worker: it is built at startup, updated by this worker's crud product writes, and
+# rebuilt from the database every AUTOCOMPLETE_REFRESH_SECONDS. Product writes made by other workers and
+# category changes (which have no crud hook) show up after the next rebuild, so suggestions can be that
+# stale; a product deleted elsewhere may still be suggested until then.
+
+PRODUCT = "product"
+CATEGORY = "category"
+DEFAULT_SUGGESTION_LIMIT = 10
+MIN_TRIGRAM_SIMILARITY = 0.5
+# Bounds the work for very short prefixes such as a single letter
+MAX_PREFIX_CANDIDATES = 500
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.environ.get("AUTOCOMPLETE_REFRESH_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(value: str):
+    return " ".join(re.findall(r"\w+", value.lower()))
+
+
+def trigrams(value: str):
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}
+        self._tokens = []
+        self._trigrams = defaultdict(set)
+
+    def add(self, kind: str, entry_id: int, name: str):
+        key = (kind, entry_id)
+        with self._lock:
+            self._remove(key)
+            normalized = normalize(name)
+            self._names[key] = (name, normalized)
+            for token in set(normalized.split()):
+                bisect.insort(self._tokens, (token, key))
+            for gram in trigrams(normalized):
+                self._trigrams[gram].add(key)
+
+    def remove(self, kind: str, entry_id: int):
+        with self._lock:
+            self._remove((kind, entry_id))
+
+    def _remove(self, key):
+        entry = self._names.pop(key, None)
+        if entry is None:
+            return
+        normalized = entry[1]
+        for token in set(normalized.split()):
+            position = bisect.bisect_left(self._tokens, (token, key))
+            if position < len(self._tokens) and self._tokens[position] == (token, key):
+                del self._tokens[position]
+        for gram in trigrams(normalized):
+            keys = self._trigrams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[gram]
+
+    def rebuild(self, entries):
+        # Bulk load with a single sort instead of one insort per token
+        names = {}
+        tokens = []
+        grams = defaultdict(set)
+        for kind, entry_id, name in entries:
+            key = (kind, entry_id)
+            normalized = normalize(name)
+            names[key] = (name, normalized)
+            tokens.extend((token, key) for token in set(normalized.split()))
+            for gram in trigrams(normalized):
+                grams[gram].add(key)
+        tokens.sort()
+        with self._lock:
+            self._names, self._tokens, self._trigrams = names, tokens, grams
+
+    def _prefix_matches(self, query: str):
+        words = query.split()
+        last = words[-1]
+        matches = set()
+        position = bisect.bisect_left(self._tokens, (last,))
+        end = min(len(self._tokens), position + MAX_PREFIX_CANDIDATES)
+        while position < end and self._tokens[position][0].startswith(last):
+            key = self._tokens[position][1]
+            tokens = self._names[key][1].split()
+            # Earlier words of a multi-word query have to prefix some other word of the name
+            if all(any(token.startswith(word) for token in tokens) for word in words[:-1]):
+                matches.add(key)
+            position += 1
+        return matches
+
+    def _trigram_matches(self, query: str):
+        query_grams = trigrams(query)
+        counts = defaultdict(int)
+        for gram in query_grams:
+            for key in self._trigrams.get(gram, ()):
+                counts[key] += 1
+        return {
+            key: count / len(query_grams)
+            for key, count in counts.items()
+            if count / len(query_grams) >= MIN_TRIGRAM_SIMILARITY
+        }
+
+    def suggest(self, query: str, limit: int = DEFAULT_SUGGESTION_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        with self._lock:
+            prefix = self._prefix_matches(query)
+            ranked = sorted(
+                prefix,
+                key=lambda key: (not self._names[key][1].startswith(query), len(self._names[key][1]), key),
+            )
+            if len(ranked) < limit and len(query) >= 3:
+                fuzzy = self._trigram_matches(query)
+                ranked += sorted(
+                    (key for key in fuzzy if key not in prefix),
+                    key=lambda key: (-fuzzy[key], len(self._names[key][1]), key),
+                )
+            return [
+                {"type": kind, "id": entry_id, "name": self._names[(kind, entry_id)][0]}
+                for kind, entry_id in ranked[:limit]
+            ]
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def build_autocomplete_index(db: Session):
+    categories = ((CATEGORY, category_id, name) for category_id, name in db.query(Category.id, Category.name))
+    products = ((PRODUCT, product_id, name) for product_id, name in db.query(Product.id, Product.name).yield_per(1000))
+    autocomplete_index.rebuild(itertools.chain(categories, products))
+
+
+def load_autocomplete_index():
+    db = SessionLocal()
+    try:
+        build_autocomplete_index(db)
+    finally:
+        db.close()
+
+
+async def run_autocomplete_refresher(interval: float = AUTOCOMPLETE_REFRESH_SECONDS):
+    # The index is built once at startup; this picks up writes from other workers and category changes
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(load_autocomplete_index)
+        except Exception:
+            logger.exception("Autocomplete index refresh failed")
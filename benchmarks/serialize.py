@@ -0,0 +1,195 @@
+"""
+Serialization benchmarks for the list endpoints.
+
+    python benchmarks/serialize.py endpoints [--rows 1000 10000 100000] [--repeat 3]
+    python benchmarks/serialize.py adapters [--rows 10000] [--repeat 3]
+
+endpoints: end-to-end request time for GET /buyer/products (the whole catalog, paged by cursor),
+/farmer/orders and /admin/users against a scratch SQLite database, with FAST_JSON_RESPONSES off and
+on. The flag is read at import time, so each mode runs in its own subprocess.
+
+adapters: in-memory rows serialized the way FastAPI does for response_model (validate, then
+jsonable_encoder, then json.dumps) against schemas.dump_list_json and its cached TypeAdapter.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS_PAGE = 200
+
+
+def seed(rows: int):
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, engine
+    from models import Buyer, Farmer, Order, OrderItem, Product, User
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x", "is_buyer": True}
+            for i in range(rows)
+        ])
+        admin = User(name="Admin", email="admin@example.com", password="x", is_admin=True)
+        farmer_user = User(name="Farmer", email="farmer@example.com", password="x", is_farmer=True)
+        db.add_all([admin, farmer_user])
+        db.flush()
+        farmer = Farmer(user_id=farmer_user.id, pending=False)
+        buyer = Buyer(user_id=1)
+        db.add_all([farmer, buyer])
+        db.flush()
+        db.execute(insert(Product), [
+            {"name": f"Product {i}", "farmer_id": farmer.id, "price": Decimal("2.50"), "quantity": 10, "image_url": f"{i}.png"}
+            for i in range(rows)
+        ])
+        db.execute(insert(Order), [
+            {"buyer_id": buyer.id, "date": datetime(2026, 1, 1), "status": "pending", "amount": Decimal("5.00")}
+            for _ in range(rows)
+        ])
+        db.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": order_id, "quantity": 2, "price": Decimal("2.50")}
+            for order_id in range(1, rows + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def best_of(repeat: int, run):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_endpoints(rows: int, repeat: int):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routers import admin, buyer, farmer
+    from tokens import create_access_token
+
+    seed(rows)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    app.include_router(buyer.router, prefix="/buyer")
+    app.include_router(farmer.router, prefix="/farmer")
+    client = TestClient(app)
+
+    def get(path: str, email: str = None):
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"} if email else {}
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+        return response
+
+    def all_products():
+        cursor = None
+        while True:
+            response = get(f"/buyer/products?limit={PRODUCTS_PAGE}" + (f"&cursor={cursor}" if cursor else ""))
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return
+
+    requests = {
+        "products(all)": all_products,
+        "/farmer/orders": lambda: get("/farmer/orders", "farmer@example.com"),
+        "/admin/users": lambda: get("/admin/users", "admin@example.com"),
+    }
+    for run in requests.values():
+        run()  # warm the principal cache and the statement cache
+    return {name: best_of(repeat, run) for name, run in requests.items()}
+
+
+def sample_rows(rows: int):
+    now = datetime(2026, 1, 1)
+    items = [SimpleNamespace(id=i, product_id=i, quantity=2, price=Decimal("2.50")) for i in range(3)]
+    return {
+        "UserResponse": [
+            SimpleNamespace(id=i, name=f"User {i}", email=f"user{i}@example.com", is_admin=False, is_buyer=True, is_farmer=False)
+            for i in range(rows)
+        ],
+        "OrderResponse": [
+            SimpleNamespace(id=i, buyer_id=1, date=now, status="pending", amount=Decimal("7.50"), items=items)
+            for i in range(rows)
+        ],
+        "MessageResponse": [
+            SimpleNamespace(id=i, sender_id=1, content=f"Message {i}", timestamp=now) for i in range(rows)
+        ],
+        "CategoryResponse": [SimpleNamespace(id=i, name=f"Category {i}") for i in range(rows)],
+    }
+
+
+def run_adapters(rows: int, repeat: int):
+    import asyncio
+    from typing import List
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    import schemas
+
+    print(f"{'schema':<18} {'response_model':>14} {'adapter':>9}  speedup")
+    for name, data in sample_rows(rows).items():
+        model = getattr(schemas, name)
+        field = create_model_field(name="Response", type_=List[model], mode="serialization")
+
+        def response_model():
+            content = asyncio.run(serialize_response(field=field, response_content=data, is_coroutine=True))
+            return json.dumps(content).encode()
+
+        def adapter():
+            return schemas.dump_list_json(model, data)
+
+        assert json.loads(response_model()) == json.loads(adapter())
+        default, cached = best_of(repeat, response_model), best_of(repeat, adapter)
+        print(f"{name:<18} {default * 1000:>12.0f}ms {cached * 1000:>7.0f}ms  {default / cached:.1f}x")
+
+
+def run_child(mode: str, rows: int, repeat: int):
+    scratch = tempfile.mkdtemp(prefix="serialize-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+        FAST_JSON_RESPONSES="1" if mode == "fast" else "0",
+    )
+    output = subprocess.run(
+        [sys.executable, __file__, "endpoints", "--child", "--rows", str(rows), "--repeat", str(repeat)],
+        env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=["endpoints", "adapters"])
+    parser.add_argument("--rows", type=int, nargs="+")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(run_endpoints(args.rows[0], args.repeat)))
+        return
+    if args.benchmark == "adapters":
+        sys.path.insert(0, ROOT)
+        for rows in args.rows or [10000]:
+            run_adapters(rows, args.repeat)
+        return
+
+    print(f"{'rows':>8}  {'endpoint':<16} {'default':>9} {'fast':>9}  speedup")
+    for rows in args.rows or [1000, 10000, 100000]:
+        default, fast = run_child("default", rows, args.repeat), run_child("fast", rows, args.repeat)
+        for name in default:
+            print(f"{rows:>8}  {name:<16} {default[name]:>8.3f}s {fast[name]:>8.3f}s  {default[name] / fast[name]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
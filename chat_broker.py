@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+# Pub/sub fan-out for chat pushes, one channel per user.
+# publish() is synchronous and thread-safe so crud can call it from threadpool handlers;
+# subscribers are WebSocket handlers on the event loop.
+# The default broker only reaches sockets on the same worker. With several workers a socket and the
+# request that writes the message usually land on different ones, so set CHAT_BROKER_URL to a redis://
+# URL to relay pushes over Redis pub/sub; redis is only imported when that URL is set.
+
+CHAT_BROKER_URL = os.environ.get("CHAT_BROKER_URL", "")
+# A slow socket drops its oldest pending pushes rather than growing without bound;
+# clients resync missed messages over REST.
+SUBSCRIPTION_QUEUE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id: int):
+    return f"chat:user:{user_id}"
+
+
+class Subscription:
+    def __init__(self, loop, max_size: int = SUBSCRIPTION_QUEUE_SIZE):
+        self._loop = loop
+        self._queue = asyncio.Queue(max_size)
+
+    def deliver(self, message: str):
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop already closed; the socket is gone
+            pass
+
+    def _put(self, message: str):
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(message)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._unsubscribe(channel, subscription)
+
+    def _unsubscribe(self, channel: str, subscription: Subscription):
+        subscribers = self._subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def has_subscribers(self, channel: str):
+        with self._lock:
+            return channel in self._subscribers
+
+    def publish(self, channel: str, message: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+
+class RedisBroker:
+    """
+    Relays every publish through Redis pub/sub; each worker's listener hands messages on to its own
+    sockets through an InProcessBroker. Redis is subscribed to a channel only while a local socket wants it.
+    Publishing uses a sync client, since crud publishes from threadpool handlers; the listener uses an
+    asyncio client on the event loop. Both are passed in, which is how the tests run two brokers
+    against one fakeredis server.
+    """
+
+    def __init__(self, publisher, subscriber):
+        self.publisher = publisher
+        self.subscriber = subscriber
+        self.local = InProcessBroker()
+        self._pubsub = None
+        self._listener = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("CHAT_BROKER_URL points at Redis but the redis package is not installed")
+        return cls(redis.Redis.from_url(url), redis.asyncio.Redis.from_url(url))
+
+    async def _listen(self):
+        async for event in self._pubsub.listen():
+            if event.get("type") != "message":
+                continue
+            channel, data = event["channel"], event["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            if isinstance(data, bytes):
+                data = data.decode()
+            self.local.publish(channel, data)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.subscriber.pubsub()
+            if not self.local.has_subscribers(channel):
+                await self._pubsub.subscribe(channel)
+        try:
+            async with self.local.subscribe(channel) as subscription:
+                async with self._lock:
+                    if self._listener is None or self._listener.done():
+                        self._listener = asyncio.create_task(self._listen())
+                yield subscription
+        finally:
+            async with self._lock:
+                if not self.local.has_subscribers(channel):
+                    await self._pubsub.unsubscribe(channel)
+
+    def publish(self, channel: str, message: str):
+        try:
+            return self.publisher.publish(channel, message)
+        except Exception:
+            logger.exception("Failed to publish chat message to Redis")
+            return 0
+
+
+def create_broker(url: str = CHAT_BROKER_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker.from_url(url)
+    return InProcessBroker()
+
+
+broker = create_broker()
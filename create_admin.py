@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import User
+from passwords import hash_password
 
 # Predefined admin credentials
 ADMIN_EMAIL = "admin"
@@ -18,7 +19,7 @@ def create_admin():
     new_admin = User(
         name="Admin",
         email=ADMIN_EMAIL,
-        password=ADMIN_PASSWORD,
+        password=hash_password(ADMIN_PASSWORD),
         is_admin=True,
         is_buyer=False,
         is_farmer=False
@@ -1,17 +1,31 @@
-from sqlalchemy.orm import Session, joinedload
-from models import User, Farmer, Product, Farm, Buyer, Category, Order, OrderItem, Conversation, Message
+from sqlalchemy import and_, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from models import User, Farmer, Product, Farm, Buyer, Category, Order, OrderItem, Conversation, Message, ConversationReadState
 from schemas import (
     UserCreate,
     BuyerCreate,
     FarmerCreate,
     ProductCreate,
-    OrderCreate
+    OrderCreate,
+    MessageResponse
 )
 from datetime import datetime
+from decimal import Decimal
+import json
+import chat_broker
+import inventory
+import search
+import tokens
+from autocomplete import autocomplete_index, PRODUCT
+from passwords import HashingOverloadedError, needs_rehash, password_hasher
+from principals import Principal, principal_cache
 
 # User Operations
 def create_user(db: Session, user_data):
-    new_user = User(**user_data.dict())
+    user_fields = user_data.model_dump()
+    user_fields["password"] = password_hasher.hash(user_fields["password"])
+    new_user = User(**user_fields)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
@@ -19,9 +33,16 @@ def create_user(db: Session, user_data):
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
-    if user and user.password == password:
-        return user
-    return None
+    if user is None or not password_hasher.verify(password, user.password):
+        return None
+    if needs_rehash(user.password):
+        # Upgrades legacy plaintext rows and outdated scrypt parameters
+        try:
+            user.password = password_hasher.hash(password)
+        except HashingOverloadedError:
+            return user
+        db.commit()
+    return user
 
 def get_current_user(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
@@ -34,10 +55,11 @@ def create_farmer(db: Session, farmer_data: FarmerCreate):
         "address": farmer_data.farm_address,
         "size": farmer_data.farm_size
     }
-    user_data = farmer_data.dict()
+    user_data = farmer_data.model_dump()
     user_data.pop("farm_address")
     user_data.pop("farm_size")
     user_data["is_farmer"] = True
+    user_data["password"] = password_hasher.hash(user_data["password"])
     user = User(**user_data)
     db.add(user)
     db.flush()
@@ -58,8 +80,9 @@ def create_farmer(db: Session, farmer_data: FarmerCreate):
     return {"user": user, "farmer": farmer, "farm": farm}
 
 def create_buyer(db: Session, buyer_data: BuyerCreate):
-    user_data = buyer_data.dict()
+    user_data = buyer_data.model_dump()
     user_data["is_buyer"] = True
+    user_data["password"] = password_hasher.hash(user_data["password"])
 
     buyer_info = {
         "address": user_data.pop("address"),
@@ -86,6 +109,36 @@ def get_farmer_by_user_id(db: Session, user_id: int):
 def get_buyer_by_user_id(db: Session, user_id: int):
     return db.query(Buyer).filter(Buyer.user_id == user_id).first()
 
+def principal_statement(email: str):
+    # User plus farmer/buyer role ids in a single round trip
+    return (
+        select(User, Farmer.id, Farmer.pending, Buyer.id)
+        .outerjoin(Farmer, Farmer.user_id == User.id)
+        .outerjoin(Buyer, Buyer.user_id == User.id)
+        .where(User.email == email)
+        .limit(1)
+    )
+
+def load_principal(db: Session, email: str):
+    return principal_from_row(db.execute(principal_statement(email)).first())
+
+def principal_from_row(row):
+    if row is None:
+        return None
+    user, farmer_id, farmer_pending, buyer_id = row
+    return Principal(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        phone_number=user.phone_number,
+        is_admin=user.is_admin,
+        is_buyer=bool(user.is_buyer),
+        is_farmer=bool(user.is_farmer),
+        farmer_id=farmer_id,
+        farmer_pending=farmer_pending,
+        buyer_id=buyer_id,
+    )
+
 
 # Admin Operations
 def get_pending_farmers(db: Session):
@@ -106,14 +159,18 @@ def approve_farmer(db: Session, farmer_id: int):
         farmer.pending = False
         db.commit()
         db.refresh(farmer)
+        principal_cache.invalidate_user(farmer.user_id)
         return farmer
     return None
 
 def reject_farmer(db: Session, farmer_id: int, reason: str):
     farmer = db.query(Farmer).filter(Farmer.id == farmer_id).first()
     if farmer:
+        user_id = farmer.user_id
+        touch_farmer_products(db, farmer.id)
         db.delete(farmer)
         db.commit()
+        principal_cache.invalidate_user(user_id)
         return {"message": f"Farmer rejected: {reason}"}
     return None
 
@@ -121,8 +178,11 @@ def disable_user(db: Session, user_id: int):
     user = db.query(User).filter(User.id == user_id).first()
     if user:
         user.is_active = False
+        tokens.revoke_subject(db, user.email)
+        tokens.revoke_user_sessions(db, user_id)
         db.commit()
         db.refresh(user)
+        principal_cache.invalidate_user(user_id)
         return user
     return None
 
@@ -132,6 +192,7 @@ def enable_user(db: Session, user_id: int):
         user.is_active = True
         db.commit()
         db.refresh(user)
+        principal_cache.invalidate_user(user_id)
         return user
     return None
 
@@ -141,6 +202,7 @@ def create_product(db: Session, product_data):
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    autocomplete_index.add(PRODUCT, new_product.id, new_product.name)
     return new_product
 
 def get_farmer_products(db: Session, farmer_id: int):
@@ -149,13 +211,23 @@ def get_farmer_products(db: Session, farmer_id: int):
 def get_product_by_id(db: Session, product_id: int):
     return db.query(Product).filter(Product.id == product_id).first()
 
+def get_product_detail(db: Session, product_id: int):
+    # ProductResponse walks product -> farmer -> user and farms; load it all in one statement
+    return (
+        db.query(Product)
+        .options(joinedload(Product.farmer).options(joinedload(Farmer.user), joinedload(Farmer.farms)))
+        .filter(Product.id == product_id)
+        .first()
+    )
+
 def update_product(db: Session, product_id: int, product_data):
     product = get_product_by_id(db, product_id)
     if product:
-        for key, value in product_data.dict().items():
+        for key, value in product_data.model_dump().items():
             setattr(product, key, value)
         db.commit()
         db.refresh(product)
+        autocomplete_index.add(PRODUCT, product.id, product.name)
         return product
     return None
 
@@ -164,17 +236,50 @@ def delete_product(db: Session, product_id: int):
     if product:
         db.delete(product)
         db.commit()
+        autocomplete_index.remove(PRODUCT, product_id)
         return {"message": "Product deleted successfully"}
     return None
 
+def get_product_version(db: Session, product_id: int):
+    return db.query(Product.version).filter(Product.id == product_id).scalar()
+
+def touch_farmer_products(db: Session, farmer_id: int):
+    # Product detail responses embed the farmer and their user, so changes there are product changes too
+    db.execute(
+        update(Product)
+        .where(Product.farmer_id == farmer_id)
+        .values(version=Product.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def get_available_products(db: Session):
-    return db.query(Product).filter(Product.quantity > 0).all()
+def get_available_products(db: Session, after_id: int = None, limit: int = None):
+    query = db.query(Product).filter(Product.quantity > 0)
+    if after_id is not None:
+        query = query.filter(Product.id > after_id)
+    query = query.order_by(Product.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_available_product_rows(db: Session, after_id: int = None, limit: int = None):
+    # Column tuples for the fast serialization path, same page as get_available_products
+    statement = select(*Product.__table__.columns).where(Product.quantity > 0)
+    if after_id is not None:
+        statement = statement.where(Product.id > after_id)
+    statement = statement.order_by(Product.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return db.execute(statement).all()
+
+def iter_available_products(db: Session, batch_size: int = 500):
+    # Streams rows in fixed-size batches instead of materializing the whole catalog
+    return db.query(Product).filter(Product.quantity > 0).order_by(Product.id).yield_per(batch_size)
 
-def search_products(db: Session, query: str):
-    return db.query(Product).filter(Product.name.ilike(f"%{query}%")).all()
+def search_products(db: Session, query: str, limit: int = search.DEFAULT_SEARCH_LIMIT):
+    return search.search_products(db, query, limit)
 
 def filter_products(db: Session, price_range: str = None, category_id: int = None, farm_location: str = None):
     query = db.query(Product)
@@ -197,39 +302,97 @@ def list_categories(db: Session):
 def list_non_admin_users(db: Session):
     return db.query(User).filter(User.is_admin == False).all()
 
+def list_non_admin_user_rows(db: Session):
+    # UserResponse fields as column tuples
+    return db.execute(
+        select(User.name, User.email, User.id, User.is_admin, User.is_buyer, User.is_farmer)
+        .where(User.is_admin == False)
+    ).all()
+
 def delete_user(db: Session, user_id: int):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         return
+    for farmer_id, in db.query(Farmer.id).filter(Farmer.user_id == user_id).all():
+        touch_farmer_products(db, farmer_id)
+    tokens.revoke_subject(db, user.email)
+    tokens.revoke_user_sessions(db, user_id)
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
+
+def get_buyer_orders(db: Session, buyer_id: int):
+    return db.query(Order).options(selectinload(Order.items)).filter(Order.buyer_id == buyer_id).all()
+
+def get_farmer_orders(db: Session, farmer_id: int):
+    return (
+        db.query(Order)
+        .options(selectinload(Order.items))
+        .filter(Order.items.any(OrderItem.product.has(Product.farmer_id == farmer_id)))
+        .all()
+    )
+
+def get_farmer_order_rows(db: Session, farmer_id: int):
+    # Orders and their items as column tuples; items are matched with a subquery rather than an id list
+    order_ids = select(Order.id).where(Order.items.any(OrderItem.product.has(Product.farmer_id == farmer_id)))
+    orders = db.execute(
+        select(Order.id, Order.buyer_id, Order.date, Order.status, Order.amount).where(Order.id.in_(order_ids))
+    ).all()
+    items = db.execute(
+        select(OrderItem.order_id, OrderItem.id, OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+        .where(OrderItem.order_id.in_(order_ids))
+    ).all()
+    return orders, items
 
 def get_order_by_id(db: Session, order_id: int):
     return db.query(Order).filter(Order.id == order_id).first()
 
+class InvalidOrderError(Exception):
+    pass
+
 def create_order(db: Session, order_data: OrderCreate):
+    # One transaction, constant round trips: products in one IN query, one conditional stock UPDATE,
+    # the order, then all items and holds in one executemany each
+    quantities = {}
+    for item in order_data.items:
+        if item.quantity <= 0:
+            raise InvalidOrderError(f"Invalid quantity for product {item.product_id}")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        raise InvalidOrderError("Order has no items")
+
+    products = {
+        product.id: product
+        for product in db.query(Product).filter(Product.id.in_(quantities)).all()
+    }
+    missing = sorted(set(quantities) - set(products))
+    if missing:
+        raise InvalidOrderError(f"Products not found: {missing}")
+
+    inventory.reserve_stock(db, quantities)
+
+    # Prices come from the catalog, never from the client
     order = Order(
         buyer_id=order_data.buyer_id,
         date=order_data.date,
         status='pending',
-        amount=order_data.amount
+        amount=sum((products[product_id].price * quantity for product_id, quantity in quantities.items()), Decimal(0))
     )
     db.add(order)
+    db.flush()
+    order_id = order.id
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": order_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "price": products[product_id].price
+        }
+        for product_id, quantity in quantities.items()
+    ])
+    inventory.create_holds(db, order_id, quantities)
     db.commit()
-    db.refresh(order)
-
-    for item in order_data.items:
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price
-        )
-        db.add(order_item)
-    
-    db.commit()
-    db.refresh(order)
-    return order
+    return db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
 
 # Chat operations
 def get_conversation(db: Session, conversation_id: int):
@@ -245,11 +408,37 @@ def get_or_create_conversation(db: Session, farmer_id: int, buyer_id: int):
     else:
         conversation = Conversation(farmer_id=farmer_id, buyer_id=buyer_id)
         db.add(conversation)
+        db.flush()
+        db.add_all([
+            ConversationReadState(conversation_id=conversation.id, user_id=user_id, unread_count=0)
+            for user_id in get_conversation_participants(db, conversation.id)
+        ])
         db.commit()
         db.refresh(conversation)
         return conversation
 
+def get_conversation_participants(db: Session, conversation_id: int):
+    return get_participants_by_conversation(db, [conversation_id]).get(conversation_id, set())
+
+def get_participants_by_conversation(db: Session, conversation_ids):
+    # User ids of the buyer and farmer in each conversation
+    rows = (
+        db.query(Conversation.id, Buyer.user_id, Farmer.user_id)
+        .outerjoin(Buyer, Conversation.buyer_id == Buyer.id)
+        .outerjoin(Farmer, Conversation.farmer_id == Farmer.id)
+        .filter(Conversation.id.in_(conversation_ids))
+        .all()
+    )
+    return {
+        conversation_id: {user_id for user_id in (buyer_user_id, farmer_user_id) if user_id is not None}
+        for conversation_id, buyer_user_id, farmer_user_id in rows
+    }
+
+def get_conversations_by_ids(db: Session, conversation_ids):
+    return db.query(Conversation).filter(Conversation.id.in_(conversation_ids)).all()
+
 def create_message(db: Session, conversation_id: int, sender_id: int, content: str):
+    participants = get_conversation_participants(db, conversation_id)
     message = Message(
         conversation_id=conversation_id,
         sender_id=sender_id,
@@ -257,18 +446,241 @@ def create_message(db: Session, conversation_id: int, sender_id: int, content: s
         timestamp=datetime.utcnow()
     )
     db.add(message)
+    db.flush()
+    # Unread counters move in the same transaction as the message itself
+    db.execute(
+        update(ConversationReadState)
+        .where(ConversationReadState.conversation_id == conversation_id, ConversationReadState.user_id != sender_id)
+        .values(unread_count=ConversationReadState.unread_count + 1)
+    )
+    db.execute(
+        update(ConversationReadState)
+        .where(ConversationReadState.conversation_id == conversation_id, ConversationReadState.user_id == sender_id)
+        .values(last_read_message_id=message.id, unread_count=0)
+    )
     db.commit()
     db.refresh(message)
+    publish_message(message, participants)
     return message
 
+def create_messages_batch(db: Session, sender_id: int, messages, retry: bool = True):
+    """
+    Insert a batch of queued messages in one transaction, skipping client_message_ids the
+    sender has already delivered. Returns one message per item, new or existing, in request order; an id
+    repeated within the batch is stored once and returned for each of its items.
+    Membership must already have been checked by the caller.
+    """
+    client_ids = [item.client_message_id for item in messages]
+    try:
+        existing = {
+            message.client_message_id: message
+            for message in db.query(Message).filter(
+                Message.sender_id == sender_id,
+                Message.client_message_id.in_(client_ids)
+            ).all()
+        }
+        pending = {}
+        for item in messages:
+            if item.client_message_id not in existing and item.client_message_id not in pending:
+                pending[item.client_message_id] = item
+
+        created = []
+        if pending:
+            now = datetime.utcnow()
+            created = db.scalars(insert(Message).returning(Message), [
+                {
+                    "conversation_id": item.conversation_id,
+                    "sender_id": sender_id,
+                    "content": item.content,
+                    "timestamp": now,
+                    "client_message_id": client_message_id
+                }
+                for client_message_id, item in pending.items()
+            ]).all()
+
+            per_conversation = {}
+            for message in created:
+                count, latest = per_conversation.get(message.conversation_id, (0, 0))
+                per_conversation[message.conversation_id] = (count + 1, max(latest, message.id))
+            for conversation_id, (count, latest) in per_conversation.items():
+                db.execute(
+                    update(ConversationReadState)
+                    .where(ConversationReadState.conversation_id == conversation_id, ConversationReadState.user_id != sender_id)
+                    .values(unread_count=ConversationReadState.unread_count + count)
+                )
+                db.execute(
+                    update(ConversationReadState)
+                    .where(ConversationReadState.conversation_id == conversation_id, ConversationReadState.user_id == sender_id)
+                    .values(last_read_message_id=latest, unread_count=0)
+                )
+            db.commit()
+    except IntegrityError:
+        # A concurrent retry of the same batch got there first; what it stored is the answer
+        db.rollback()
+        if not retry:
+            raise
+        return create_messages_batch(db, sender_id, messages, retry=False)
+
+    if created:
+        participants = get_participants_by_conversation(db, {message.conversation_id for message in created})
+        for message in created:
+            publish_message(message, participants.get(message.conversation_id, set()))
+    stored = {**existing, **{message.client_message_id: message for message in created}}
+    return [stored[client_message_id] for client_message_id in client_ids]
+
+def mark_conversation_read(db: Session, conversation_id: int, user_id: int, message_id: int = None):
+    """
+    Move a participant's read cursor forward, to message_id or to the newest message.
+    Returns None when message_id is not part of the conversation.
+    """
+    latest_id = db.query(Message.id).filter(Message.conversation_id == conversation_id).order_by(
+        Message.timestamp.desc(), Message.id.desc()
+    ).limit(1).scalar()
+    if message_id is None:
+        message_id = latest_id
+    elif not db.query(Message.id).filter(Message.id == message_id, Message.conversation_id == conversation_id).first():
+        return None
+
+    state = db.query(ConversationReadState).filter(
+        ConversationReadState.conversation_id == conversation_id,
+        ConversationReadState.user_id == user_id
+    ).first()
+    if state is None:
+        state = ConversationReadState(conversation_id=conversation_id, user_id=user_id, unread_count=0)
+        db.add(state)
+    if message_id is None or (state.last_read_message_id is not None and state.last_read_message_id >= message_id):
+        db.commit()
+        return state
+
+    state.last_read_message_id = message_id
+    if message_id == latest_id:
+        state.unread_count = 0
+    else:
+        # Only the messages still unread past the cursor are counted
+        state.unread_count = db.query(func.count(Message.id)).filter(
+            Message.conversation_id == conversation_id,
+            Message.id > message_id,
+            Message.sender_id != user_id
+        ).scalar()
+    db.commit()
+    db.refresh(state)
+    publish_read_receipt(state, get_conversation_participants(db, conversation_id))
+    return state
+
+def get_unread_counts(db: Session, user_id: int):
+    return db.query(ConversationReadState).filter(
+        ConversationReadState.user_id == user_id,
+        ConversationReadState.unread_count > 0
+    ).all()
+
+def get_messages(db: Session, conversation_id: int, before_id: int = None, since_id: int = None, limit: int = 50):
+    """
+    One page of a conversation's history, oldest first, keyed on (timestamp, id).
+    Without a cursor returns the newest page; before_id pages backwards, since_id syncs forwards.
+    Returns None when the cursor is not a message of this conversation.
+    """
+    query = db.query(Message).filter(Message.conversation_id == conversation_id)
+    position = tuple_(Message.timestamp, Message.id)
+    cursor_id = since_id if since_id is not None else before_id
+    if cursor_id is not None:
+        cursor = db.query(Message.timestamp, Message.id).filter(
+            Message.id == cursor_id, Message.conversation_id == conversation_id
+        ).first()
+        if cursor is None:
+            return None
+        if since_id is not None:
+            query = query.filter(position > tuple_(*cursor))
+            return query.order_by(Message.timestamp, Message.id).limit(limit).all()
+        query = query.filter(position < tuple_(*cursor))
+    page = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit).all()
+    page.reverse()
+    return page
+
+def publish_message(message: Message, participants):
+    # Push to both participants' sockets; the sender's other devices want it too
+    payload = json.dumps({
+        "type": "message",
+        "conversation_id": message.conversation_id,
+        **MessageResponse.model_validate(message).model_dump(mode="json"),
+    })
+    for user_id in participants:
+        chat_broker.broker.publish(chat_broker.user_channel(user_id), payload)
+
+def publish_read_receipt(state: ConversationReadState, participants):
+    payload = json.dumps({
+        "type": "read",
+        "conversation_id": state.conversation_id,
+        "user_id": state.user_id,
+        "last_read_message_id": state.last_read_message_id,
+    })
+    for user_id in participants:
+        if user_id != state.user_id:
+            chat_broker.broker.publish(chat_broker.user_channel(user_id), payload)
+
 def get_conversations_for_user(db: Session, user_id: int):
     user = get_user_by_id(db, user_id)
     if user.is_farmer:
         farmer = get_farmer_by_user_id(db, user_id)
-        conversations = db.query(Conversation).options(joinedload(Conversation.messages)).filter(Conversation.farmer_id == farmer.id).all()
+        return get_conversations_for_participant(db, farmer_id=farmer.id)
     elif user.is_buyer:
         buyer = get_buyer_by_user_id(db, user_id)
-        conversations = db.query(Conversation).options(joinedload(Conversation.messages)).filter(Conversation.buyer_id == buyer.id).all()
+        return get_conversations_for_participant(db, buyer_id=buyer.id)
+    return []
+
+def get_conversations_for_participant(db: Session, farmer_id: int = None, buyer_id: int = None):
+    if farmer_id is not None:
+        return db.query(Conversation).options(joinedload(Conversation.messages)).filter(Conversation.farmer_id == farmer_id).all()
+    if buyer_id is not None:
+        return db.query(Conversation).options(joinedload(Conversation.messages)).filter(Conversation.buyer_id == buyer_id).all()
+    return []
+
+def get_inbox(db: Session, user_id: int, farmer_id: int = None, buyer_id: int = None):
+    """
+    Every conversation of a participant with its last message, unread count and counterparty name.
+    One statement: the last message is a correlated subquery that walks the
+    (conversation_id, timestamp, id) index and the unread count is the stored counter,
+    so cost does not grow with history length.
+    """
+    if farmer_id is not None:
+        own = Conversation.farmer_id == farmer_id
+        counterparty = (Buyer, Conversation.buyer_id == Buyer.id, Buyer.user_id)
+    elif buyer_id is not None:
+        own = Conversation.buyer_id == buyer_id
+        counterparty = (Farmer, Conversation.farmer_id == Farmer.id, Farmer.user_id)
     else:
-        conversations = []
-    return conversations
+        return []
+    counterparty_model, counterparty_join, counterparty_user_id = counterparty
+
+    last_message_id = (
+        select(Message.id)
+        .where(Message.conversation_id == Conversation.id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(1)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    last_message = aliased(Message)
+    rows = (
+        db.query(Conversation, User.name, last_message, func.coalesce(ConversationReadState.unread_count, 0))
+        .outerjoin(counterparty_model, counterparty_join)
+        .outerjoin(User, User.id == counterparty_user_id)
+        .outerjoin(last_message, last_message.id == last_message_id)
+        .outerjoin(ConversationReadState, and_(
+            ConversationReadState.conversation_id == Conversation.id,
+            ConversationReadState.user_id == user_id
+        ))
+        .filter(own)
+        .order_by(last_message.timestamp.desc().nulls_last(), Conversation.id.desc())
+        .all()
+    )
+    return [
+        {
+            "conversation_id": conversation.id,
+            "farmer_id": conversation.farmer_id,
+            "buyer_id": conversation.buyer_id,
+            "counterparty_name": counterparty_name,
+            "last_message": message,
+            "unread_count": unread,
+        }
+        for conversation, counterparty_name, message, unread in rows
+    ]
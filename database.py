@@ -1,15 +1,146 @@
+import bisect
+import itertools
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc as sqlalchemy_exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./test.db")
 print(f"Connecting to the db: {DATABASE_URL}")
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Checkouts that wait longer than this are logged, well before they turn into pool timeouts
+DB_POOL_SLOW_CHECKOUT_SECONDS = float(os.environ.get("DB_POOL_SLOW_CHECKOUT_SECONDS", "0.5"))
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    def __init__(self, buckets=POOL_WAIT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def observe_wait(self, seconds: float):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+
+    def record(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = list(itertools.accumulate(self.bucket_counts))
+            return {
+                "wait_seconds": {
+                    "buckets": {str(bound): count for bound, count in zip(self.buckets, cumulative)},
+                    "count": self.wait_count,
+                    "sum": self.wait_sum,
+                },
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+    """
+    stats = pool_stats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            self.stats.record("timeouts")
+            logger.error("Connection pool exhausted: %s", self.status())
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.stats.observe_wait(waited)
+            if waited > DB_POOL_SLOW_CHECKOUT_SECONDS:
+                logger.warning("Waited %.3fs for a pooled connection: %s", waited, self.status())
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def engine_options(url: str, poolclass):
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def count_pool_events(sync_engine, stats: PoolStats):
+    @event.listens_for(sync_engine, "connect")
+    def _count_connect(dbapi_connection, connection_record):
+        stats.record("connects")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _count_invalidate(dbapi_connection, connection_record, exception):
+        stats.record("invalidations")
+
+
+def pool_status(pool, stats: PoolStats):
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    status.update(stats.snapshot())
+    return status
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, InstrumentedQueuePool))
+count_pool_events(engine, pool_stats)
+
+
+def get_pool_status():
+    status = pool_status(engine.pool, pool_stats)
+    # The async engine only exists once an async route has been used
+    if async_engine is not None:
+        status["async"] = pool_status(async_engine.pool, async_pool_stats)
+    return status
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -20,3 +151,36 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async variant for routers that opt in. Uses asyncpg on Postgres and aiosqlite on SQLite.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Created on first use so the sync app still starts when the async drivers are not installed
+async_engine = None
+AsyncSessionLocal = None
+
+
+def get_async_sessionmaker():
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool))
+        count_pool_events(async_engine.sync_engine, async_pool_stats)
+        AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -2,29 +2,46 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from database import get_db
-from crud import get_user_by_email
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from crud import load_principal
+from principals import Principal, principal_cache
+from tokens import InvalidTokenError, create_access_token, decode_access_token, is_revoked
 
-# Replace with your actual secret and algorithms
-SECRET_KEY = "your-secret-key"
-ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-# Dependency: Get the current user
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def resolve_principal(token: str, db: Session) -> Principal:
+    """
+    Resolve a bearer token to a Principal, serving hot tokens from the principal cache.
+    """
+    payload = decode_token(token, db)
+    email: str = payload.get("sub")
+    principal = principal_cache.get(email)
+    if principal is None:
+        principal = load_principal(db, email)
+        if principal is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal_cache.put(email, principal)
+    return principal
+
+
+def decode_token(token: str, db: Session) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = get_user_by_email(db, email)
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.JWTError:
+        payload = decode_access_token(token)
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if is_revoked(db, payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
+
+
+# Dependency: Get the current user
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Principal:
+    return resolve_principal(token, db)
 
 
 # Dependency: Admin role check
@@ -33,30 +50,3 @@ def get_admin_user(user=Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Access forbidden: Admins only")
     return user
 
-
-def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
-    """
-    Create a JWT token with the given data and expiration time.
-    """
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return token
-
-
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = get_user_by_email(db, email=email)
-        if user is None:
-            raise HTTPException(status_code=404, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
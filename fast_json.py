@@ -0,0 +1,39 @@
+import os
+from decimal import Decimal
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from schemas import dump_list_json
+
+# Fast serialization for list endpoints. list_response() encodes validated rows with the schema's cached TypeAdapter.
+# The opt-in path goes further: rows are fetched as column tuples and rendered with orjson,
+# skipping ORM hydration, jsonable_encoder and response_model validation.
+# Enable with FAST_JSON_RESPONSES=1 (requires the optional `orjson` package). Output matches the default path.
+
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "0").lower() in ("1", "true", "yes")
+
+if FAST_JSON_RESPONSES:
+    try:
+        import orjson
+    except ImportError:
+        raise RuntimeError("FAST_JSON_RESPONSES is enabled but the orjson package is not installed")
+
+
+def _default(value):
+    # DECIMAL columns, encoded the way jsonable_encoder does
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    raise TypeError
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content):
+        return orjson.dumps(content, default=_default)
+
+
+def rows_to_dicts(rows):
+    return [row._asdict() for row in rows]
+
+
+def list_response(model, rows, headers: dict = None):
+    # Validated and encoded by the schema's cached TypeAdapter; same body as response_model produces
+    return Response(dump_list_json(model, rows), media_type="application/json", headers=headers)
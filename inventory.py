@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Product, InventoryHold, Order
+
+# Inventory reservations for checkout.
+# Stock is taken with a single conditional UPDATE per cart, so concurrent buyers never oversell
+# and rows stay locked only for the duration of the order transaction.
+# Each reserved line gets a hold; paying confirms the holds, and the sweeper returns stock
+# for holds that expire before payment arrives.
+
+INVENTORY_HOLD_MINUTES = int(os.environ.get("INVENTORY_HOLD_MINUTES", "15"))
+INVENTORY_SWEEP_SECONDS = float(os.environ.get("INVENTORY_SWEEP_SECONDS", "30"))
+INVENTORY_SWEEP_BATCH_SIZE = int(os.environ.get("INVENTORY_SWEEP_BATCH_SIZE", "500"))
+
+HELD = "held"
+CONFIRMED = "confirmed"
+RELEASED = "released"
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStockError(Exception):
+    pass
+
+
+def reserve_stock(db: Session, quantities: dict):
+    """
+    Decrement stock for every product in the cart, all or nothing.
+    Runs in the caller's transaction; the caller commits.
+    """
+    product_ids = sorted(quantities)
+    requested = case(quantities, value=Product.id)
+    result = db.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.quantity >= requested)
+        .values(quantity=Product.quantity - requested)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(product_ids):
+        db.rollback()
+        raise InsufficientStockError("Not enough stock for one or more products")
+
+
+def create_holds(db: Session, order_id: int, quantities: dict):
+    expires_at = datetime.utcnow() + timedelta(minutes=INVENTORY_HOLD_MINUTES)
+    db.add_all([
+        InventoryHold(order_id=order_id, product_id=product_id, quantity=quantity, status=HELD, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def confirm_holds(db: Session, order_id: int):
+    """
+    Turn an order's live holds into a sale. Runs in the caller's transaction.
+    Returns False when the holds have already been released by the sweeper.
+    """
+    db.execute(
+        update(InventoryHold)
+        .where(InventoryHold.order_id == order_id, InventoryHold.status == HELD)
+        .values(status=CONFIRMED)
+        .execution_options(synchronize_session=False)
+    )
+    released = db.query(InventoryHold.id).filter(
+        InventoryHold.order_id == order_id, InventoryHold.status == RELEASED
+    ).first()
+    return released is None
+
+
+def release_expired_holds(db: Session, now: datetime = None, batch_size: int = INVENTORY_SWEEP_BATCH_SIZE):
+    now = now or datetime.utcnow()
+    holds = (
+        db.query(InventoryHold.id, InventoryHold.order_id, InventoryHold.product_id, InventoryHold.quantity)
+        .filter(InventoryHold.status == HELD, InventoryHold.expires_at < now)
+        .order_by(InventoryHold.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not holds:
+        return 0
+
+    # Claim the batch first so a concurrent sweeper can never return the same stock twice
+    hold_ids = [hold.id for hold in holds]
+    claimed = db.execute(
+        update(InventoryHold)
+        .where(InventoryHold.id.in_(hold_ids), InventoryHold.status == HELD)
+        .values(status=RELEASED)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != len(hold_ids):
+        db.rollback()
+        return 0
+
+    restock = {}
+    for hold in holds:
+        restock[hold.product_id] = restock.get(hold.product_id, 0) + hold.quantity
+    returned = case(restock, value=Product.id)
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(sorted(restock)))
+        .values(quantity=Product.quantity + returned)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Order)
+        .where(Order.id.in_({hold.order_id for hold in holds}), Order.status == 'pending')
+        .values(status='expired')
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(holds)
+
+
+def sweep_expired_holds():
+    db = SessionLocal()
+    try:
+        while release_expired_holds(db) == INVENTORY_SWEEP_BATCH_SIZE:
+            pass
+    finally:
+        db.close()
+
+
+async def run_hold_sweeper(interval: float = INVENTORY_SWEEP_SECONDS):
+    while True:
+        try:
+            await asyncio.to_thread(sweep_expired_holds)
+        except Exception:
+            logger.exception("Inventory hold sweep failed")
+        await asyncio.sleep(interval)
@@ -1,16 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routers import auth, admin, farmer, buyer, common, payments, deliveries, firebase, chat
-from database import Base, engine
+from database import Base, engine, SessionLocal
+from autocomplete import build_autocomplete_index, run_autocomplete_refresher
+from inventory import run_hold_sweeper
+from metrics import MetricsMiddleware, render_metrics
+from passwords import HashingOverloadedError, hashing_overloaded_handler
+from rate_limit import LoginRateLimitMiddleware
+from tokens import refresh_revocations, run_revocation_refresher
 import uvicorn
 
-app = FastAPI(title="Farmer Market System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = SessionLocal()
+    try:
+        build_autocomplete_index(db)
+        refresh_revocations(db)
+    finally:
+        db.close()
+    hold_sweeper = asyncio.create_task(run_hold_sweeper())
+    revocation_refresher = asyncio.create_task(run_revocation_refresher())
+    autocomplete_refresher = asyncio.create_task(run_autocomplete_refresher())
+    yield
+    hold_sweeper.cancel()
+    revocation_refresher.cancel()
+    autocomplete_refresher.cancel()
+
+
+app = FastAPI(title="Farmer Market System", lifespan=lifespan)
+
+
+app.add_exception_handler(HashingOverloadedError, hashing_overloaded_handler)
 
 origins = [
     "http://localhost:3000",
     "https://yourdomain.com"
 ]
 
+# Added before CORS so throttled responses still carry CORS headers
+app.add_middleware(LoginRateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -18,6 +50,14 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
 )
+# Outermost, so throttled and CORS-rejected requests are measured too
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 app.include_router(firebase.router, prefix="/firebase", tags=["Firebase"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
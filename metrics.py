@@ -0,0 +1,148 @@
+import bisect
+import contextvars
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database import pool_stats
+
+# Per-request telemetry in Prometheus text format: latency, SQL statement count, DB time and
+# response size, labelled by route template. SQL is counted through cursor events on every Engine,
+# which covers database.engine and the async engine alike; the per-request totals travel in a
+# context variable, which sync endpoints see because the threadpool runs them in a copy of the context.
+# Metrics are per worker process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets, label_names=("method", "route", "status")):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), count, total) for labels, (counts, count, total) in self._series.items()}
+        for labels, (counts, count, total) in sorted(series.items()):
+            label_text = ",".join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+        return lines
+
+
+def escape(value: str):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_latency = Histogram("http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS)
+request_statements = Histogram("http_request_db_statements", "SQL statements executed per request.", STATEMENT_BUCKETS)
+request_db_time = Histogram("http_request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+response_size = Histogram("http_response_size_bytes", "Response body size by route.", SIZE_BUCKETS)
+REQUEST_HISTOGRAMS = (request_latency, request_statements, request_db_time, response_size)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            stats.db_seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            # The router records the matched route in the scope; label by its template, not the raw path
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", UNMATCHED_ROUTE), str(status))
+            request_latency.observe(labels, elapsed)
+            request_statements.observe(labels, stats.statements)
+            request_db_time.observe(labels, stats.db_seconds)
+            response_size.observe(labels, size)
+
+
+def render_metrics():
+    lines = []
+    for histogram in REQUEST_HISTOGRAMS:
+        lines.extend(histogram.render())
+    pool = pool_stats.snapshot()
+    wait = pool["wait_seconds"]
+    lines.append("# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection.")
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for bound, count in wait["buckets"].items():
+        lines.append(f'db_pool_checkout_wait_seconds_bucket{{le="{bound}"}} {count}')
+    lines.append(f'db_pool_checkout_wait_seconds_bucket{{le="+Inf"}} {wait["count"]}')
+    lines.append(f"db_pool_checkout_wait_seconds_count {wait['count']}")
+    lines.append(f"db_pool_checkout_wait_seconds_sum {wait['sum']}")
+    for counter in ("timeouts", "connects", "invalidations"):
+        lines.append(f"# TYPE db_pool_{counter}_total counter")
+        lines.append(f"db_pool_{counter}_total {pool[counter]}")
+    return "\n".join(lines) + "\n"
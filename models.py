@@ -1,5 +1,6 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Text, Boolean, DECIMAL, TIMESTAMP
+from sqlalchemy import DDL, event, Column, ForeignKey, Index, Integer, String, Float, Text, Boolean, DECIMAL, TIMESTAMP, UniqueConstraint
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import literal_column, text
 from database import Base
 from datetime import datetime
 
@@ -21,19 +22,28 @@ class User(Base):
 class Farmer(Base):
     __tablename__ = 'farmers'
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
     user = relationship('User', back_populates='farmers')
     farms = relationship('Farm', back_populates='farmer')
     products = relationship('Product', back_populates='farmer')
     pending = Column(Boolean, default=True)
     conversations = relationship('Conversation', back_populates='farmer')
 
+    # Registration creates one farm per farmer; FarmerResponse exposes it flattened
+    @property
+    def farm_address(self):
+        return self.farms[0].address if self.farms else None
+
+    @property
+    def farm_size(self):
+        return self.farms[0].size if self.farms else None
+
 class Buyer(Base):
     __tablename__ = 'buyers'
     id = Column(Integer, primary_key=True, index=True)
     address = Column(String(255), nullable=True)
     payment_method = Column(String(20), nullable=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
     user = relationship('User', back_populates='buyers')
     orders = relationship('Order', back_populates='buyer')
     conversations = relationship('Conversation', back_populates='buyer')
@@ -55,44 +65,93 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Only in-stock rows, ordered by id for the keyset-paginated catalog
+        Index('ix_products_in_stock', 'id', postgresql_where=text('quantity > 0'), sqlite_where=text('quantity > 0')),
+    )
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    farmer_id = Column(Integer, ForeignKey('farmers.id'))
+    farmer_id = Column(Integer, ForeignKey('farmers.id'), index=True)
     price = Column(DECIMAL(10, 2), nullable=False)
     quantity = Column(Integer, nullable=False)
     description = Column(Text, nullable=True)
-    category_id = Column(Integer, ForeignKey('categories.id'))
+    category_id = Column(Integer, ForeignKey('categories.id'), index=True)
     image_url = Column(String(255), nullable=True)
+    # Bumped by every UPDATE, including the bulk stock updates; drives product ETags
+    version = Column(Integer, nullable=False, default=1, server_default='1', onupdate=literal_column('version') + 1)
 
     category = relationship('Category', back_populates='products')
     farmer = relationship('Farmer', back_populates='products')
 
+# Full-text search over products, queried by search.py.
+# Postgres: expression GIN index. SQLite: external-content FTS5 table kept in sync with triggers;
+# the update trigger only fires when indexed text changes, not on stock or version updates.
+POSTGRES_SEARCH_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_products_search ON products "
+    "USING gin ((to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))))"
+)
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+    "USING fts5(name, description, content='products', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+# Keep Base.metadata.create_all (used by main.py and local SQLite setups) in step with the migrations
+event.listen(Product.__table__, "after_create", DDL(POSTGRES_SEARCH_INDEX).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
 class Order(Base):
     __tablename__ = 'orders'
     id = Column(Integer, primary_key=True, index=True)
-    buyer_id = Column(Integer, ForeignKey('buyers.id'))
+    buyer_id = Column(Integer, ForeignKey('buyers.id'), index=True)
     date = Column(TIMESTAMP, nullable=True)
     status = Column(String, nullable=True)
-    amount = Column(Integer, nullable=True)
+    amount = Column(DECIMAL(10, 2), nullable=True)
     buyer = relationship('Buyer', back_populates='orders')
     items = relationship('OrderItem', back_populates='order')
     payments = relationship('Payment', back_populates='order')
     deliveries = relationship('Delivery', back_populates='order')
+    holds = relationship('InventoryHold', back_populates='order')
+
+class InventoryHold(Base):
+    __tablename__ = 'inventory_holds'
+    __table_args__ = (
+        # The sweeper only ever scans live holds by expiry
+        Index('ix_inventory_holds_expires_at_held', 'expires_at', postgresql_where=text("status = 'held'"), sqlite_where=text("status = 'held'")),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey('orders.id'), index=True)
+    product_id = Column(Integer, ForeignKey('products.id'))
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='held')
+    expires_at = Column(TIMESTAMP, nullable=False)
+    order = relationship('Order', back_populates='holds')
 
 class OrderItem(Base):
     __tablename__ = 'orderItems'
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey('orders.id'))
-    product_id = Column(Integer, ForeignKey('products.id'))
+    order_id = Column(Integer, ForeignKey('orders.id'), index=True)
+    product_id = Column(Integer, ForeignKey('products.id'), index=True)
     quantity = Column(Integer, nullable=False)
-    price = Column(Integer, nullable=False)
+    price = Column(DECIMAL(10, 2), nullable=False)
     order = relationship('Order', back_populates='items')
     product = relationship('Product')
 
 class Payment(Base):
     __tablename__ = 'payments'
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey('orders.id'))
+    order_id = Column(Integer, ForeignKey('orders.id'), index=True)
     date = Column(TIMESTAMP, nullable=True)
     amount = Column(Integer, nullable=False)
     status = Column(String, nullable=True)
@@ -101,7 +160,7 @@ class Payment(Base):
 class Delivery(Base):
     __tablename__ = 'deliveries'
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey('orders.id'))
+    order_id = Column(Integer, ForeignKey('orders.id'), index=True)
     date = Column(TIMESTAMP, nullable=True)
     status = Column(String, nullable=True)
     delivery_address = Column(String(255), nullable=True)
@@ -110,8 +169,11 @@ class Delivery(Base):
 # New models for chat functionality
 class Conversation(Base):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        Index('ix_conversations_farmer_id_buyer_id', 'farmer_id', 'buyer_id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    buyer_id = Column(Integer, ForeignKey('buyers.id'))
+    buyer_id = Column(Integer, ForeignKey('buyers.id'), index=True)
     farmer_id = Column(Integer, ForeignKey('farmers.id'))
 
     buyer = relationship('Buyer', back_populates='conversations')
@@ -120,11 +182,50 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        Index('ix_messages_conversation_id_timestamp_id', 'conversation_id', 'timestamp', 'id'),
+        # Client-generated ids make offline resends idempotent
+        Index('ix_messages_sender_id_client_message_id', 'sender_id', 'client_message_id', unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey('conversations.id'))
     sender_id = Column(Integer, ForeignKey('users.id'))
     content = Column(Text, nullable=False)
     timestamp = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    client_message_id = Column(String(64), nullable=True)
 
     conversation = relationship('Conversation', back_populates='messages')
     sender = relationship('User', back_populates='sent_messages')
+
+class TokenRevocation(Base):
+    __tablename__ = 'token_revocations'
+    id = Column(Integer, primary_key=True, index=True)
+    # Either one token (jti) or every token issued to a subject up to revoked_at
+    jti = Column(String(64), nullable=True, index=True)
+    subject = Column(String(100), nullable=True, index=True)
+    revoked_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+class AuthSession(Base):
+    __tablename__ = 'auth_sessions'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Every rotation of one login shares a family, so reuse of a rotated token can end them all
+    family_id = Column(String(32), nullable=False, index=True)
+    # sha256 of the refresh token; the token itself is never stored
+    token_hash = Column(String(64), nullable=False, unique=True)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+    # Rotated rows are pruned once past the reuse-detection window
+    revoked_at = Column(TIMESTAMP, nullable=True, index=True)
+
+class ConversationReadState(Base):
+    __tablename__ = 'conversation_read_states'
+    __table_args__ = (
+        UniqueConstraint('conversation_id', 'user_id', name='uq_conversation_read_states_conversation_id_user_id'),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey('conversations.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    last_read_message_id = Column(Integer, nullable=True)
+    # Maintained by crud.create_message and mark_conversation_read, never counted at read time
+    unread_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,97 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+# Password hashing with scrypt, run on a dedicated bounded pool so a login storm cannot tie up the
+# request threadpool or the event loop. hashlib.scrypt releases the GIL, so threads are enough.
+# When every worker is busy and the wait queue is full, new requests are shed with HashingOverloadedError
+# instead of queueing behind the backlog.
+# The sync login and register routes block a request thread on each job, so the default limits keep
+# running plus waiting jobs at 16 or fewer, well under anyio's 40-thread request pool. A login storm
+# then gets 503s while the rest of the API keeps its threads.
+# Stored values look like scrypt$<n>$<r>$<p>$<salt>$<hash>. Anything else is a legacy plaintext
+# password, which is replaced with a hash the next time its owner logs in.
+
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 2, 8))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", str(PASSWORD_HASH_WORKERS)))
+SCRYPT_N = int(os.environ.get("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", "1"))
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class HashingOverloadedError(Exception):
+    pass
+
+
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloadedError):
+    # Shed logins and registrations while the password hashing pool is saturated
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
+
+
+def _b64encode(value: bytes):
+    return base64.b64encode(value).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=KEY_BYTES)
+
+
+def hash_password(password: str):
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def is_hashed(stored: str):
+    return stored.startswith(SCHEME + "$")
+
+
+def check_password(password: str, stored: str):
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, n, r, p, salt, key = stored.split("$")
+    candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, base64.b64decode(key))
+
+
+def needs_rehash(stored: str):
+    return not stored.startswith(f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # Running plus waiting jobs
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloadedError("Too many password operations in flight")
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str):
+        return self._submit(hash_password, password).result()
+
+    def verify(self, password: str, stored: str):
+        return self._submit(check_password, password, stored).result()
+
+    async def hash_async(self, password: str):
+        return await asyncio.wrap_future(self._submit(hash_password, password))
+
+    async def verify_async(self, password: str, stored: str):
+        return await asyncio.wrap_future(self._submit(check_password, password, stored))
+
+
+password_hasher = PasswordHasher()
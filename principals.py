@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# Authenticated principals, cached by token subject so hot tokens skip the user and role lookups.
+# Invalidation is local to the worker; the TTL bounds how long other workers can serve a stale entry.
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.environ.get("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    phone_number: Optional[str]
+    is_admin: bool
+    is_buyer: bool
+    is_farmer: bool
+    farmer_id: Optional[int] = None
+    farmer_pending: Optional[bool] = None
+    buyer_id: Optional[int] = None
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._subjects = {}
+
+    def get(self, subject: str):
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                self._discard(subject)
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def put(self, subject: str, principal: Principal):
+        with self._lock:
+            self._discard(subject)
+            self._entries[subject] = (principal, time.monotonic() + self.ttl)
+            self._subjects[principal.id] = subject
+            while len(self._entries) > self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._subjects.pop(evicted.id, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            subject = self._subjects.get(user_id)
+            if subject is not None:
+                self._discard(subject)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._subjects.clear()
+
+    def _discard(self, subject: str):
+        entry = self._entries.pop(subject, None)
+        if entry is not None:
+            self._subjects.pop(entry[0].id, None)
+
+
+principal_cache = PrincipalCache()
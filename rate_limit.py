@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from fastapi.responses import JSONResponse
+
+# Token-bucket throttling for the login endpoints, keyed by client IP and by account.
+# Runs as ASGI middleware, so rejected attempts never reach routing, the database or the password pool.
+# The default backend is per worker, so with N workers an attacker effectively gets N times the
+# budget. LOGIN_RATE_LIMIT_URL=redis://... keeps the buckets in Redis so every worker spends from
+# the same ones; the redis import only happens when it is set.
+# The client IP is taken from the ASGI scope; run uvicorn with --proxy-headers behind a proxy.
+
+LOGIN_RATE_LIMIT_URL = os.environ.get("LOGIN_RATE_LIMIT_URL", "")
+LOGIN_RATE_IP_PER_MINUTE = float(os.environ.get("LOGIN_RATE_IP_PER_MINUTE", "30"))
+LOGIN_RATE_IP_BURST = float(os.environ.get("LOGIN_RATE_IP_BURST", "10"))
+LOGIN_RATE_ACCOUNT_PER_MINUTE = float(os.environ.get("LOGIN_RATE_ACCOUNT_PER_MINUTE", "5"))
+LOGIN_RATE_ACCOUNT_BURST = float(os.environ.get("LOGIN_RATE_ACCOUNT_BURST", "5"))
+LOGIN_RATE_MAX_KEYS = int(os.environ.get("LOGIN_RATE_MAX_KEYS", "100000"))
+
+LOGIN_PATHS = {"/auth/login", "/buyer/login", "/farmer/login", "/admin/login"}
+# Login bodies are tiny; anything larger is not worth buffering to find the account
+MAX_BUFFERED_BODY = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def take_token(tokens: float, updated: float, now: float, rate: float, burst: float):
+    """
+    Refill a bucket holding `tokens` at `updated` and try to take one token.
+    `rate` is tokens per second. Returns (allowed, tokens left, seconds until a token is available).
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int = LOGIN_RATE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float):
+        # Only touched from the event loop, so no lock is needed
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        allowed, tokens, retry_after = take_token(tokens, updated, now, rate, burst)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisBackend:
+    """
+    Keeps each bucket as a "tokens:timestamp" string in Redis, read and rewritten under WATCH/MULTI
+    so concurrent workers never double-spend a token. Uses wall-clock time, since workers do not
+    share a monotonic clock, and the asyncio client because the middleware runs on the event loop.
+    Redis errors fail open: throttling must not take logins down with it.
+    """
+
+    def __init__(self, client, prefix: str = "login-rate:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("LOGIN_RATE_LIMIT_URL points at Redis but the redis package is not installed")
+        return cls(redis.asyncio.Redis.from_url(url))
+
+    async def take(self, key: str, rate: float, burst: float):
+        from redis.exceptions import WatchError
+
+        key = self.prefix + key
+        # A full bucket is the same as no bucket, so entries can expire once refilled
+        ttl_ms = int(burst / rate * 1000) + 1000
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(key)
+                        now = time.time()
+                        stored = await pipe.get(key)
+                        if stored is None:
+                            tokens, updated = burst, now
+                        else:
+                            tokens, updated = map(float, stored.decode().split(":"))
+                        allowed, tokens, retry_after = take_token(tokens, updated, now, rate, burst)
+                        pipe.multi()
+                        pipe.set(key, f"{tokens}:{now}", px=ttl_ms)
+                        await pipe.execute()
+                        return allowed, retry_after
+                    except WatchError:
+                        continue
+        except Exception:
+            logger.exception("Login rate limiter could not reach Redis")
+            return True, 0.0
+
+
+class LoginRateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def check(self, ip: str, account: str = None):
+        """Returns 0 when the attempt may proceed, otherwise the seconds to wait."""
+        limits = [(f"ip:{ip}", LOGIN_RATE_IP_PER_MINUTE / 60, LOGIN_RATE_IP_BURST)]
+        if account:
+            limits.append((f"account:{account}", LOGIN_RATE_ACCOUNT_PER_MINUTE / 60, LOGIN_RATE_ACCOUNT_BURST))
+        for key, rate, burst in limits:
+            allowed, retry_after = await self.backend.take(key, rate, burst)
+            if not allowed:
+                return retry_after
+        return 0.0
+
+
+def create_limiter(url: str = LOGIN_RATE_LIMIT_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return LoginRateLimiter(RedisBackend.from_url(url))
+    return LoginRateLimiter(MemoryBackend())
+
+
+def login_account(content_type: str, body: bytes):
+    # JSON logins send "email"; the OAuth2 form on /auth/login sends "username"
+    try:
+        if content_type.startswith("application/json"):
+            account = json.loads(body).get("email")
+        elif content_type.startswith("application/x-www-form-urlencoded"):
+            account = parse_qs(body.decode()).get("username", [None])[0]
+        else:
+            return None
+    except (ValueError, AttributeError):
+        return None
+    return account.strip().lower() if isinstance(account, str) else None
+
+
+class LoginRateLimitMiddleware:
+    def __init__(self, app, limiter: LoginRateLimiter = None, paths=LOGIN_PATHS):
+        self.app = app
+        self.limiter = limiter or login_rate_limiter
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the body to read the account, then replay it to the route
+        messages = []
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if not message.get("more_body") or size > MAX_BUFFERED_BODY:
+                break
+
+        account = None
+        if size <= MAX_BUFFERED_BODY:
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            account = login_account(content_type, b"".join(m.get("body", b"") for m in messages))
+        client = scope.get("client")
+        retry_after = await self.limiter.check(client[0] if client else "unknown", account)
+        if retry_after:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many login attempts, try again later"},
+                headers={"Retry-After": str(max(1, round(retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+
+login_rate_limiter = create_limiter()
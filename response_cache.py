@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Serialized responses for read-mostly GET routes, with ETag revalidation.
+# Product keys embed the row version, so any product write retires them implicitly. Categories have
+# no write path in the API (they are edited in the database directly), so the categories entry is only
+# retired by its TTL; code that adds a category write should call response_cache.invalidate(CATEGORIES_KEY).
+# The default backend is per worker, so each worker warms its own copy and an invalidation only
+# reaches the worker that made it. RESPONSE_CACHE_URL=redis://... shares one cache between
+# workers instead; redis is imported only in that case.
+
+RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+CATEGORIES_KEY = "categories"
+
+logger = logging.getLogger(__name__)
+
+
+def product_key(product_id: int, version: int):
+    # Keyed by version, so any product UPDATE retires the old entry
+    return f"product:{product_id}:{version}"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (body, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Stores entries in Redis under a key prefix, with the TTL as a Redis expiry. The client is sync
+    because cached routes render in the threadpool. The cache is an optimization, so every Redis
+    error is logged and treated as a miss or a skipped write rather than failing the request.
+    """
+
+    def __init__(self, client, prefix: str = "response:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL points at Redis but the redis package is not installed")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception:
+            logger.exception("Failed to read response cache entry from Redis")
+            return None
+
+    def set(self, key: str, body: bytes, ttl: float):
+        try:
+            self.client.set(self.prefix + key, body, px=int(ttl * 1000))
+        except Exception:
+            logger.exception("Failed to write response cache entry to Redis")
+
+    def delete(self, *keys: str):
+        try:
+            self.client.delete(*(self.prefix + key for key in keys))
+        except Exception:
+            logger.exception("Failed to invalidate response cache entries in Redis")
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=self.prefix + "*"):
+                self.client.delete(key)
+        except Exception:
+            logger.exception("Failed to clear response cache entries in Redis")
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key: str):
+        return self.backend.get(key)
+
+    def put(self, key: str, body: bytes, ttl: float = None):
+        self.backend.set(key, body, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, *keys: str):
+        if keys:
+            self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def create_response_cache(url: str = RESPONSE_CACHE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return ResponseCache(RedisBackend.from_url(url))
+    return ResponseCache(MemoryBackend())
+
+
+def etag_for(body: bytes):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def weak_etag(*parts):
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str):
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == target for candidate in header.split(","))
+
+
+def not_modified(etag: str):
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def cached_json_response(request: Request, key: str, render, ttl: float = None, etag: str = None):
+    """
+    Serve the JSON for `key` from the cache, calling render() to build the content on a miss.
+    render() returns JSON-compatible content, or an already encoded body as bytes.
+    Answers 304 with no body when the client already holds the current representation.
+    Pass `etag` when the caller can version the content without rendering it; the 304 check
+    then happens before the cache or render() is touched.
+    """
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    body = response_cache.get(key)
+    if body is None:
+        content = render()
+        body = content if isinstance(content, bytes) else json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+        response_cache.put(key, body, ttl)
+    etag = etag or etag_for(body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+response_cache = create_response_cache()
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from crud import get_pending_farmers, approve_farmer, reject_farmer, disable_user, enable_user, authenticate_user, list_non_admin_users, delete_user, get_user_by_id
-from database import get_db
+from crud import get_pending_farmers, approve_farmer, reject_farmer, disable_user, enable_user, authenticate_user, list_non_admin_users, list_non_admin_user_rows, delete_user, get_user_by_id
+from database import get_db, get_pool_status
+from fast_json import FAST_JSON_RESPONSES, FastJSONResponse, list_response, rows_to_dicts
+from slow_queries import slow_query_log
 from schemas import LoginRequest, UserResponse
 from dependencies import create_access_token, get_current_user
-from models import User
+from principals import Principal
+from tokens import issue_refresh_token
 from typing import List
 
 router = APIRouter()
@@ -16,7 +19,7 @@ def login_admin(login_request: LoginRequest, db: Session = Depends(get_db)):
     if user is None or not user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     access_token = create_access_token({"sub": user.email, "role": "admin" if user.is_admin else "user"})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": issue_refresh_token(db, user.id)}
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
@@ -27,31 +30,33 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 @router.get("/farmers/pending")
-def list_pending_farmers(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_pending_farmers(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     return get_pending_farmers(db)
 
 
 @router.post("/farmers/{farmer_id}/approve")
-def approve_farmer_account(farmer_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def approve_farmer_account(farmer_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     return approve_farmer(db, farmer_id)
 
 
 @router.post("/farmers/{farmer_id}/reject")
-def reject_farmer_account(farmer_id: int, reason: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def reject_farmer_account(farmer_id: int, reason: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     return reject_farmer(db, farmer_id, reason)
 
 
 @router.get("/users", response_model=List[UserResponse])
-def list_users(db: Session = Depends(get_db),  current_user: User = Depends(get_current_user)):
+def list_users(db: Session = Depends(get_db),  current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException("You are not admin")
-    return list_non_admin_users(db)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(rows_to_dicts(list_non_admin_user_rows(db)))
+    return list_response(UserResponse, list_non_admin_users(db))
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
@@ -63,7 +68,7 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/users/{user_id}")
-def delete_user_endpoint(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_user_endpoint(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="You are not admin")
     delete_user(db, user_id)
@@ -71,14 +76,28 @@ def delete_user_endpoint(user_id: int, db: Session = Depends(get_db), current_us
 
 
 @router.post("/users/{user_id}/disable")
-def disable_account(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def disable_account(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     return disable_user(db, user_id)
 
 
 @router.post("/users/{user_id}/enable")
-def enable_account(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def enable_account(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="User is not admin")
     return enable_user(db, user_id)
+
+
+@router.get("/db/pool")
+def database_pool_status(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="User is not admin")
+    return get_pool_status()
+
+
+@router.get("/db/slow-queries")
+def slow_queries(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="User is not admin")
+    return slow_query_log.entries()
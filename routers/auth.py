@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
-from schemas import Token, UserResponse
-from dependencies import get_current_user, create_access_token
-from crud import authenticate_user
-from models import User
-from database import get_db
+from datetime import datetime, timedelta
+from schemas import RefreshRequest, Token, UserResponse
+from dependencies import get_current_user, create_access_token, decode_token, oauth2_scheme
+from async_crud import authenticate_user
+from principals import Principal
+from database import get_db, get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from tokens import InvalidRefreshTokenError, new_refresh_session, revoke_refresh_token, revoke_token, rotate_refresh_token
+from typing import Optional
 
 router = APIRouter()
 
@@ -14,16 +17,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
 @router.get("/user", response_model=UserResponse)
-def get_user_info(current_user: User = Depends(get_current_user)):
+def get_user_info(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=400, detail="Incorrect username or password"
@@ -32,4 +35,32 @@ async def login(
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    refresh_token, session = new_refresh_session(user.id)
+    db.add(session)
+    await db.commit()
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/refresh", response_model=Token)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    try:
+        user, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    except InvalidRefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    access_token = create_access_token(
+        data={"sub": user.email, "role": "admin" if user.is_admin else "user"},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/logout")
+def logout(request: Optional[RefreshRequest] = None, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = decode_token(token, db)
+    if payload.get("jti") is None:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+    revoke_token(db, payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+    if request is not None:
+        revoke_refresh_token(db, request.refresh_token)
+    db.commit()
+    return {"message": "Logged out"}
\ No newline at end of file
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from crud import get_available_products, search_products, filter_products, create_buyer, authenticate_user, get_buyer_by_user_id, get_product_by_id, create_order
-from database import get_db
+from crud import get_available_products, get_available_product_rows, iter_available_products, search_products, filter_products, create_buyer, authenticate_user, get_buyer_by_user_id, get_product_detail, get_product_version, create_order, InvalidOrderError, get_buyer_orders as crud_get_buyer_orders
+from database import get_db, SessionLocal
+from fast_json import FAST_JSON_RESPONSES, FastJSONResponse, list_response, rows_to_dicts
+from autocomplete import autocomplete_index, DEFAULT_SUGGESTION_LIMIT
+from inventory import InsufficientStockError
 from schemas import BuyerCreate, LoginRequest, BuyerResponse, ProductResponse, OrderResponse, OrderCreate
 from dependencies import create_access_token, get_current_user
-from models import User
+from principals import Principal
+from tokens import issue_refresh_token
+from response_cache import cached_json_response, etag_matches, not_modified, product_key, weak_etag
 from typing import List, Optional
 
 router = APIRouter()
 
+PRODUCTS_PAGE_SIZE = 50
+PRODUCTS_MAX_PAGE_SIZE = 200
+PRODUCTS_STREAM_BATCH_SIZE = 500
+SEARCH_PAGE_SIZE = 20
+
 
 @router.post("/register")
 def register_buyer(buyer_data: BuyerCreate, db: Session = Depends(get_db)):
@@ -25,31 +39,65 @@ def login_buyer(login_request: LoginRequest, db: Session = Depends(get_db)):
     if buyer is None:
         raise HTTPException(status_code=403, detail="user is not buyer")
     access_token = create_access_token({"sub": user.email, "role": "admin" if user.is_admin else "user"})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": issue_refresh_token(db, user.id)}
 
 
 @router.get("/user", response_model=BuyerResponse)
-def get_buyer_info(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_buyer_info(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     buyer = get_buyer_by_user_id(db, current_user.id)
     if buyer is None:
         raise HTTPException(status_code=403, detail="User is not buyer")
     return buyer
 
 
-@router.get("/products")
-def browse_products(db: Session = Depends(get_db)):
-    return get_available_products(db)
-
+def stream_products_ndjson():
+    # The request-scoped session is closed before a streamed body is sent,
+    # so the generator owns its own session for the lifetime of the stream.
+    db = SessionLocal()
+    try:
+        for product in iter_available_products(db, PRODUCTS_STREAM_BATCH_SIZE):
+            yield json.dumps(jsonable_encoder(product)) + "\n"
+    finally:
+        db.close()
 
-@router.get("/products/{product_id}", response_model=ProductResponse)
-def get_product_endpoint(product_id: int, db: Session = Depends(get_db)):
-    return get_product_by_id(db, product_id)
 
+@router.get("/products")
+def browse_products(
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(PRODUCTS_PAGE_SIZE, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    if stream:
+        return StreamingResponse(stream_products_ndjson(), media_type="application/x-ndjson")
+    if FAST_JSON_RESPONSES:
+        products = get_available_product_rows(db, after_id=cursor, limit=limit)
+    else:
+        products = get_available_products(db, after_id=cursor, limit=limit)
+    # A page is unchanged while the same products are listed at the same versions
+    page_versions = ",".join(f"{product.id}:{product.version}" for product in products)
+    etag = weak_etag("catalog", hashlib.blake2b(page_versions.encode(), digest_size=16).hexdigest())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag}
+    if len(products) == limit:
+        headers["X-Next-Cursor"] = str(products[-1].id)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(rows_to_dicts(products), headers=headers)
+    response.headers.update(headers)
+    return products
 
 
 @router.get("/products/search")
-def search_products_endpoint(query: str, db: Session = Depends(get_db)):
-    return search_products(db, query)
+def search_products_endpoint(query: str, limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=PRODUCTS_MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    return search_products(db, query, limit)
+
+
+@router.get("/products/autocomplete")
+def autocomplete_products_endpoint(query: str, limit: int = Query(DEFAULT_SUGGESTION_LIMIT, ge=1, le=50)):
+    return autocomplete_index.suggest(query, limit)
 
 
 @router.get("/products/filter")
@@ -57,19 +105,38 @@ def filter_products_endpoint(price_range: Optional[str] = None, category: Option
     return filter_products(db, price_range, category)
 
 
+@router.get("/products/{product_id}", response_model=ProductResponse)
+def get_product_endpoint(product_id: int, request: Request, db: Session = Depends(get_db)):
+    # Revalidation only reads the version column; farmer and user are loaded on a cache miss
+    version = get_product_version(db, product_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    def render():
+        product = get_product_detail(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return ProductResponse.model_validate(product)
+
+    return cached_json_response(request, product_key(product_id, version), render, etag=weak_etag("product", product_id, version))
+
+
+
 @router.post("/orders", response_model=OrderResponse)
-def place_order(order_data: OrderCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    buyer = get_buyer_by_user_id(db, current_user.id)
-    if not buyer:
+def place_order(order_data: OrderCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.buyer_id is None:
         raise HTTPException(status_code=403, detail="User is not a buyer")
-    order_data.buyer_id = buyer.id
-    order = create_order(db, order_data)
-    return order
+    order_data.buyer_id = current_user.buyer_id
+    try:
+        return create_order(db, order_data)
+    except InvalidOrderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 
 @router.get("/orders", response_model=List[OrderResponse])
-def get_buyer_orders(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    buyer = get_buyer_by_user_id(db, current_user.id)
-    if not buyer:
+def get_buyer_orders(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.buyer_id is None:
         raise HTTPException(status_code=403, detail="User is not a buyer")
-    return buyer.orders
+    return list_response(OrderResponse, crud_get_buyer_orders(db, current_user.buyer_id))
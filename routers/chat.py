@@ -1,27 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from database import get_db, SessionLocal
 import models, schemas, crud
-from dependencies import get_current_user
+from chat_broker import broker, user_channel
+from dependencies import get_current_user, resolve_principal
+from fast_json import list_response
+from principals import Principal
 
 router = APIRouter()
 
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
+def is_participant(conversation: models.Conversation, user: Principal):
+    if user.is_farmer:
+        return conversation.farmer_id == user.farmer_id
+    if user.is_buyer:
+        return conversation.buyer_id == user.buyer_id
+    return False
+
+def get_participant_conversation(db: Session, conversation_id: int, user: Principal):
+    conversation = crud.get_conversation(db, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    if not user.is_farmer and not user.is_buyer:
+        raise HTTPException(status_code=403, detail="Invalid user type")
+    if not is_participant(conversation, user):
+        raise HTTPException(status_code=403, detail="Not part of this conversation")
+    return conversation
+
 @router.get('/conversations', response_model=List[schemas.ConversationResponse])
-def get_conversations(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    conversations = crud.get_conversations_for_user(db, current_user.id)
-    return conversations
+def get_conversations(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    conversations = crud.get_conversations_for_participant(db, current_user.farmer_id, current_user.buyer_id)
+    return list_response(schemas.ConversationResponse, conversations)
+
+@router.get('/inbox', response_model=List[schemas.InboxEntryResponse])
+def get_inbox(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    return list_response(schemas.InboxEntryResponse, crud.get_inbox(db, current_user.id, current_user.farmer_id, current_user.buyer_id))
 
 @router.post('/conversations', response_model=schemas.ConversationResponse)
-def create_conversation(conversation_data: schemas.ConversationCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_conversation(conversation_data: schemas.ConversationCreate, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     # Validate that the current user is part of the conversation
     if current_user.is_farmer:
-        farmer = crud.get_farmer_by_user_id(db, current_user.id)
-        if farmer.id != conversation_data.farmer_id:
+        if current_user.farmer_id != conversation_data.farmer_id:
             raise HTTPException(status_code=403, detail="You can only create conversations involving yourself.")
     elif current_user.is_buyer:
-        buyer = crud.get_buyer_by_user_id(db, current_user.id)
-        if buyer.id != conversation_data.buyer_id:
+        if current_user.buyer_id != conversation_data.buyer_id:
             raise HTTPException(status_code=403, detail="You can only create conversations involving yourself.")
     else:
         raise HTTPException(status_code=403, detail="Invalid user type.")
@@ -31,41 +59,95 @@ def create_conversation(conversation_data: schemas.ConversationCreate, current_u
 
 
 @router.post('/conversations/{conversation_id}/messages', response_model=schemas.MessageResponse)
-def send_message(conversation_id: int, message_data: schemas.MessageCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    conversation = crud.get_conversation(db, conversation_id)
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-
-    user = current_user
-    if user.is_farmer:
-        farmer = crud.get_farmer_by_user_id(db, user.id)
-        if conversation.farmer_id != farmer.id:
-            raise HTTPException(status_code=403, detail="Not part of this conversation")
-    elif user.is_buyer:
-        buyer = crud.get_buyer_by_user_id(db, user.id)
-        if conversation.buyer_id != buyer.id:
-            raise HTTPException(status_code=403, detail="Not part of this conversation")
-    else:
-        raise HTTPException(status_code=403, detail="Invalid user type")
-
-    message = crud.create_message(db, conversation_id, user.id, message_data.content)
+def send_message(conversation_id: int, message_data: schemas.MessageCreate, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    get_participant_conversation(db, conversation_id, current_user)
+    message = crud.create_message(db, conversation_id, current_user.id, message_data.content)
     return message
 
+@router.post('/messages/batch', response_model=List[schemas.BatchMessageResponse])
+def send_messages_batch(batch: schemas.MessageBatchCreate, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Flushes a client's offline queue; resending the same client_message_id never duplicates a message
+    conversation_ids = {item.conversation_id for item in batch.messages}
+    conversations = {conversation.id: conversation for conversation in crud.get_conversations_by_ids(db, conversation_ids)}
+    for conversation_id in conversation_ids:
+        conversation = conversations.get(conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+        if not is_participant(conversation, current_user):
+            raise HTTPException(status_code=403, detail=f"Not part of conversation {conversation_id}")
+    return crud.create_messages_batch(db, current_user.id, batch.messages)
+
 @router.get('/conversations/{conversation_id}/messages', response_model=List[schemas.MessageResponse])
-def get_messages(conversation_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    conversation = crud.get_conversation(db, conversation_id)
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+def get_messages(
+    conversation_id: int,
+    before_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if before_id is not None and since_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or since_id, not both")
+    get_participant_conversation(db, conversation_id, current_user)
+    messages = crud.get_messages(db, conversation_id, before_id=before_id, since_id=since_id, limit=limit)
+    if messages is None:
+        raise HTTPException(status_code=400, detail="Unknown message cursor")
+    return list_response(schemas.MessageResponse, messages)
 
-    user = current_user
-    if user.is_farmer:
-        farmer = crud.get_farmer_by_user_id(db, user.id)
-        if conversation.farmer_id != farmer.id:
-            raise HTTPException(status_code=403, detail="Not part of this conversation")
-    elif user.is_buyer:
-        buyer = crud.get_buyer_by_user_id(db, user.id)
-        if conversation.buyer_id != buyer.id:
-            raise HTTPException(status_code=403, detail="Not part of this conversation")
-    else:
-        raise HTTPException(status_code=403, detail="Invalid user type")
-    return conversation.messages
+
+@router.post('/conversations/{conversation_id}/read', response_model=schemas.ReadStateResponse)
+def mark_read(conversation_id: int, read_data: schemas.MarkReadRequest, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    get_participant_conversation(db, conversation_id, current_user)
+    state = crud.mark_conversation_read(db, conversation_id, current_user.id, read_data.message_id)
+    if state is None:
+        raise HTTPException(status_code=400, detail="Message is not part of this conversation")
+    return state
+
+
+@router.get('/unread', response_model=schemas.UnreadCountsResponse)
+def get_unread(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    states = crud.get_unread_counts(db, current_user.id)
+    return {"total": sum(state.unread_count for state in states), "conversations": states}
+
+
+def authenticate_socket(token: str):
+    db = SessionLocal()
+    try:
+        return resolve_principal(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+async def drain_socket(websocket: WebSocket):
+    # Incoming frames are only keepalives; returning means the client went away
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+async def forward_messages(websocket: WebSocket, subscription):
+    async for message in subscription:
+        await websocket.send_text(message)
+
+
+@router.websocket('/ws')
+async def chat_socket(websocket: WebSocket, token: str):
+    # Browsers cannot set headers on a WebSocket handshake, so the bearer token comes in the query string
+    user = await run_in_threadpool(authenticate_socket, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    async with broker.subscribe(user_channel(user.id)) as subscription:
+        tasks = [
+            asyncio.create_task(drain_socket(websocket)),
+            asyncio.create_task(forward_messages(websocket, subscription)),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
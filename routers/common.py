@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from crud import list_categories
 from database import get_db
-from schemas import CategoryResponse
+from response_cache import cached_json_response, CATEGORIES_KEY
+from schemas import CategoryResponse, dump_list_json
 from typing import List
 
 
@@ -10,5 +11,5 @@ router = APIRouter()
 
 
 @router.get("/categories", response_model=List[CategoryResponse])
-def list_categories_endpoint(db: Session = Depends(get_db)):
-    return list_categories(db)
+def list_categories_endpoint(request: Request, db: Session = Depends(get_db)):
+    return cached_json_response(request, CATEGORIES_KEY, lambda: dump_list_json(CategoryResponse, list_categories(db)))
@@ -9,11 +9,16 @@ from crud import (
     create_farmer,
     authenticate_user,
     get_farmer_by_user_id,
-    get_product_by_id
+    get_product_by_id,
+    get_farmer_orders as crud_get_farmer_orders,
+    get_farmer_order_rows
 )
 from database import get_db
+from fast_json import FAST_JSON_RESPONSES, FastJSONResponse, list_response
 from dependencies import create_access_token, get_current_user
-from models import User, OrderItem, Order
+from models import Order
+from principals import Principal
+from tokens import issue_refresh_token
 from typing import List
 
 router = APIRouter()
@@ -36,11 +41,11 @@ def login_farmer(login_request: LoginRequest, db: Session = Depends(get_db)):
     if farmer.pending:
         raise HTTPException(status_code=403, detail="farmer is pending")
     access_token = create_access_token({"sub": user.email, "role": "admin" if user.is_admin else "user"})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": issue_refresh_token(db, user.id)}
 
 
 @router.get("/user", response_model=FarmerResponse)
-def get_farmer_info(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_farmer_info(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     farmer = get_farmer_by_user_id(db, current_user.id)
     if farmer is None:
         raise HTTPException(status_code=403, detail="User is not farmer")
@@ -48,57 +53,74 @@ def get_farmer_info(db: Session = Depends(get_db), current_user: User = Depends(
 
 
 @router.post("/products")
-def add_product(product: ProductCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    farmer = get_farmer_by_user_id(db, current_user.id)
-    if farmer is None:
+def add_product(product: ProductCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.farmer_id is None:
         raise HTTPException(status_code=403, detail="User is not farmer")
-    product_data = product.dict()
-    product_data["farmer_id"] = farmer.id
+    product_data = product.model_dump()
+    product_data["farmer_id"] = current_user.farmer_id
     return create_product(db, product_data)
 
 
 @router.get("/products")
-def list_products(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    farmer = get_farmer_by_user_id(db, current_user.id)
-    return get_farmer_products(db, farmer.id)
+def list_products(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.farmer_id is None:
+        raise HTTPException(status_code=403, detail="User is not farmer")
+    return get_farmer_products(db, current_user.farmer_id)
 
 
 @router.put("/products/{product_id}")
-def update_product_details(product_id: int, product: ProductCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    farmer = get_farmer_by_user_id(db, current_user.id)
+def update_product_details(product_id: int, product: ProductCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     product_for_update = get_product_by_id(db, product_id)
-    if product_for_update.farmer_id != farmer.id:
+    if product_for_update.farmer_id != current_user.farmer_id:
         raise HTTPException(status_code=403, detail="You are not owner of the product")
     return update_product(db, product_id, product)
 
 
 @router.delete("/products/{product_id}")
-def remove_product(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    farmer = get_farmer_by_user_id(db, current_user.id)
-    if not farmer:
+def remove_product(product_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.farmer_id is None:
         raise HTTPException(status_code=403, detail="User is not farmer")
         
     product_for_delete = get_product_by_id(db, product_id)
     if not product_for_delete:
         raise HTTPException(status_code=404, detail="Product not found")
         
-    if product_for_delete.farmer_id != farmer.id:
+    if product_for_delete.farmer_id != current_user.farmer_id:
         raise HTTPException(status_code=403, detail="You are not owner of the product")
         
     return crud_delete_product(db, product_id)
 
 
 @router.get("/orders", response_model=List[OrderResponse])
-def get_farmer_orders(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    farmer = get_farmer_by_user_id(db, current_user.id)
-    if not farmer:
+def get_farmer_orders(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.farmer_id is None:
         raise HTTPException(status_code=403, detail="User is not a farmer")
-    orders = db.query(Order).join(OrderItem).filter(OrderItem.product.has(farmer_id=farmer.id)).all()
-    return orders
+    if FAST_JSON_RESPONSES:
+        orders, items = get_farmer_order_rows(db, current_user.farmer_id)
+        items_by_order = {order.id: [] for order in orders}
+        for item in items:
+            items_by_order[item.order_id].append({
+                "id": item.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price": float(item.price)
+            })
+        return FastJSONResponse([
+            {
+                "id": order.id,
+                "buyer_id": order.buyer_id,
+                "date": order.date,
+                "status": order.status,
+                "amount": float(order.amount),
+                "items": items_by_order[order.id]
+            }
+            for order in orders
+        ])
+    return list_response(OrderResponse, crud_get_farmer_orders(db, current_user.farmer_id))
 
 
 @router.put("/orders/{id}/status", response_model=OrderResponse)
-def update_order_status(id: int, status: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_order_status(id: int, status: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     order = db.query(Order).filter(Order.id == id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
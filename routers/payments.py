@@ -4,6 +4,7 @@ from database import get_db
 from models import Payment, Order, Delivery
 from schemas import PaymentRequest
 from datetime import datetime
+from inventory import confirm_holds
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from schemas import ProductCreate, FarmerCreate, LoginRequest, FarmerResponse, OrderResponse
@@ -25,6 +26,11 @@ def process_payment(payment: PaymentRequest, db: Session = Depends(get_db)):
     order = db.query(Order).filter(Order.id == payment.order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+
+    # Committed together with the payment record below
+    if not confirm_holds(db, order.id):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Order reservation expired")
     
     payment_record = Payment(
         order_id=payment.order_id,
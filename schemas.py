@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter
 from typing import Optional, List
 from datetime import datetime
+from functools import lru_cache
 
 # User schemas
 class UserBase(BaseModel):
@@ -21,8 +22,7 @@ class UserResponse(UserBase):
     is_buyer: bool
     is_farmer: bool
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Farmer schemas
 class FarmerCreate(UserCreate):
@@ -31,12 +31,11 @@ class FarmerCreate(UserCreate):
 
 class FarmerResponse(BaseModel):
     id: int
-    farm_address: str
-    farm_size: float
+    farm_address: Optional[str] = None
+    farm_size: Optional[float] = None
     user: UserResponse
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Buyer schemas
 class BuyerCreate(UserCreate):
@@ -49,8 +48,7 @@ class BuyerResponse(BaseModel):
     payment_method: str
     user: UserResponse
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ProductCreate(BaseModel):
     image_url: str
@@ -70,25 +68,22 @@ class ProductResponse(BaseModel):
     category_id: int
     farmer: FarmerResponse
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class CategoryResponse(BaseModel):
     id: int
     name: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class OrderItemCreate(BaseModel):
     product_id: int
     quantity: int
-    price: float
 
+# Prices and the total come from the catalog; clients that still send them have the fields ignored
 class OrderCreate(BaseModel):
     buyer_id: Optional[int] = None
     date: datetime
-    amount: float
     items: List[OrderItemCreate]
 
 class OrderItemResponse(BaseModel):
@@ -97,8 +92,7 @@ class OrderItemResponse(BaseModel):
     quantity: int
     price: float
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class OrderResponse(BaseModel):
     id: int
@@ -108,12 +102,15 @@ class OrderResponse(BaseModel):
     amount: float
     items: List[OrderItemResponse]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class PaymentRequest(BaseModel):
     order_id: int
@@ -134,8 +131,18 @@ class MessageResponse(BaseModel):
     content: str
     timestamp: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class BatchMessageCreate(MessageBase):
+    conversation_id: int
+    client_message_id: str = Field(..., min_length=1, max_length=64)
+
+class MessageBatchCreate(BaseModel):
+    messages: List[BatchMessageCreate] = Field(..., min_length=1, max_length=100)
+
+class BatchMessageResponse(MessageResponse):
+    conversation_id: int
+    client_message_id: str
 
 class ConversationBase(BaseModel):
     pass
@@ -150,5 +157,38 @@ class ConversationResponse(BaseModel):
     buyer_id: int
     messages: List[MessageResponse] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class InboxEntryResponse(BaseModel):
+    conversation_id: int
+    farmer_id: int
+    buyer_id: int
+    counterparty_name: Optional[str] = None
+    last_message: Optional[MessageResponse] = None
+    unread_count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MarkReadRequest(BaseModel):
+    message_id: Optional[int] = None
+
+class ReadStateResponse(BaseModel):
+    conversation_id: int
+    user_id: int
+    last_read_message_id: Optional[int] = None
+    unread_count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UnreadCountsResponse(BaseModel):
+    total: int
+    conversations: List[ReadStateResponse]
+
+# Compiled once per response type, so list validation and JSON encoding run entirely in pydantic-core
+@lru_cache(maxsize=None)
+def list_adapter(model):
+    return TypeAdapter(List[model])
+
+def dump_list_json(model, rows):
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(rows))
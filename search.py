@@ -0,0 +1,65 @@
+import re
+from sqlalchemy import func, literal_column, or_, text
+from sqlalchemy.orm import Session
+from models import Product
+
+# Product full-text search.
+# Postgres: expression GIN index over to_tsvector(name || description), ranked with ts_rank.
+# SQLite: external-content FTS5 table kept in sync with triggers, ranked with bm25.
+# The index, table and triggers are created alongside the products table, see models.py.
+# Anything else falls back to ILIKE on name and description.
+
+SEARCH_CONFIG = "simple"
+DEFAULT_SEARCH_LIMIT = 20
+
+# Must stay textually identical to the indexed expression (models.POSTGRES_SEARCH_INDEX) or the planner will not use the GIN index
+SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(products.name, '') || ' ' || coalesce(products.description, ''))"
+
+
+def tokenize(query: str):
+    return re.findall(r"\w+", query.lower())
+
+
+def _search_postgres(db: Session, terms, limit: int):
+    # Every term must match; each one is a prefix so partially typed words still hit
+    ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+    document = literal_column(SEARCH_DOCUMENT)
+    return (
+        db.query(Product)
+        .filter(document.op("@@")(ts_query))
+        .order_by(func.ts_rank(document, ts_query).desc(), Product.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def _search_sqlite(db: Session, terms, limit: int):
+    match = " ".join(f'"{term}"*' for term in terms)
+    rows = db.execute(
+        text("SELECT rowid FROM products_fts WHERE products_fts MATCH :match ORDER BY rank LIMIT :limit"),
+        {"match": match, "limit": limit},
+    ).all()
+    ids = [row[0] for row in rows]
+    if not ids:
+        return []
+    products = {product.id: product for product in db.query(Product).filter(Product.id.in_(ids)).all()}
+    return [products[product_id] for product_id in ids if product_id in products]
+
+
+def _search_fallback(db: Session, terms, limit: int):
+    query = db.query(Product)
+    for term in terms:
+        query = query.filter(or_(Product.name.ilike(f"%{term}%"), Product.description.ilike(f"%{term}%")))
+    return query.order_by(Product.id).limit(limit).all()
+
+
+def search_products(db: Session, query: str, limit: int = DEFAULT_SEARCH_LIMIT):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return _search_postgres(db, terms, limit)
+    if dialect == "sqlite":
+        return _search_sqlite(db, terms, limit)
+    return _search_fallback(db, terms, limit)
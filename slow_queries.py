@@ -0,0 +1,151 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from metrics import current_request_stats
+
+# Slow-query log. Statements slower than SLOW_QUERY_SECONDS are logged with the types of their
+# parameters (never the values, which can be emails, password hashes or tokens), the application
+# function that issued them and the route being served, and kept in a ring buffer that admins read
+# from GET /admin/db/slow-queries.
+# A SLOW_QUERY_EXPLAIN_SAMPLE_RATE share of slow queries also get a plan. On PostgreSQL plain SELECTs
+# get EXPLAIN (ANALYZE, BUFFERS), which runs the query again on the request's connection inside a
+# savepoint, so keep the rate low; it defaults to off. A WITH statement may hide an INSERT, UPDATE or
+# DELETE, so it only gets EXPLAIN without ANALYZE. SQLite gets EXPLAIN QUERY PLAN.
+
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_SECONDS", "0.5"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0"))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get("SLOW_QUERY_BUFFER_SIZE", "100"))
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+# Frames that are plumbing rather than the code that asked for the query
+SKIPPED_FILES = {os.path.join(APP_ROOT, name) for name in ("slow_queries.py", "metrics.py", "database.py")}
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    def __init__(self, max_size: int = SLOW_QUERY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=max_size)
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def calling_function():
+    # Innermost application frame, e.g. crud.filter_products
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and "site-packages" not in filename and filename not in SKIPPED_FILES:
+            module = os.path.splitext(os.path.relpath(filename, APP_ROOT))[0].replace(os.sep, ".")
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def describe_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def leading_keyword(statement: str):
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def current_route():
+    stats = current_request_stats.get()
+    if stats is None:
+        return None
+    route = stats.scope.get("route")
+    return f'{stats.scope["method"]} {getattr(route, "path", stats.scope["path"])}'
+
+
+def explain(conn, cursor, statement: str, parameters):
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    if dialect != "postgresql":
+        return None
+    keyword = leading_keyword(statement)
+    if keyword == "WITH":
+        # Not executed, so data-modifying CTEs are safe
+        cursor.execute("EXPLAIN " + statement, parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    if keyword != "SELECT":
+        return None
+    # ANALYZE executes the query; a failure must not abort the caller's transaction
+    cursor.execute("SAVEPOINT slow_query_explain")
+    try:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        raise
+    finally:
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    return plan
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _check_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slow_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed < SLOW_QUERY_SECONDS:
+        return
+
+    entry = {
+        "at": datetime.utcnow().isoformat(),
+        "seconds": round(elapsed, 6),
+        "statement": statement,
+        "parameters": describe_parameters(parameters),
+        "caller": calling_function(),
+        "route": current_route(),
+        "plan": None,
+    }
+    logger.warning(
+        "Slow query (%.3fs) from %s during %s: %s parameter types=%s",
+        elapsed, entry["caller"], entry["route"], statement, entry["parameters"]
+    )
+    if leading_keyword(statement) in ("SELECT", "WITH") and not executemany and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        # Run on a fresh DBAPI cursor; the original one still holds the query's unread rows
+        explain_cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            entry["plan"] = explain(conn, explain_cursor, statement, parameters)
+        except Exception:
+            logger.exception("Could not capture a plan for slow query")
+        finally:
+            explain_cursor.close()
+    slow_query_log.add(entry)
@@ -0,0 +1,107 @@
+import os
+import tempfile
+
+# Point database.py at a scratch SQLite file before anything imports it
+TEST_DB_DIR = tempfile.mkdtemp(prefix="farmer-market-tests-")
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+
+import pytest
+from sqlalchemy import event
+from database import Base, SessionLocal, engine
+import models  # noqa: F401  registers the tables and search DDL on Base.metadata
+
+
+class StatementRecorder:
+    """Records the SQL statements the engine executes while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def assert_count(self, expected: int):
+        assert self.count == expected, f"expected {expected} statements, got {self.count}:\n" + "\n\n".join(
+            statement for statement, _ in self.statements
+        )
+
+
+@pytest.fixture
+def db():
+    # A fresh file per test also resets the FTS table, which drop_all does not know about
+    engine.dispose()
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocation_filter(monkeypatch):
+    # Revocations land in a process-wide bloom filter; a fresh database must not inherit them
+    import tokens
+    monkeypatch.setattr(tokens, "revocation_filter", tokens.RevocationFilter())
+
+
+@pytest.fixture
+def statements():
+    return StatementRecorder(engine)
+
+
+def create_test_app():
+    # main.py also mounts the firebase router, which needs credentials; everything else is mounted as in main.py
+    from fastapi import FastAPI
+    from passwords import HashingOverloadedError, hashing_overloaded_handler
+    from routers import admin, auth, buyer, chat, common, deliveries, farmer, payments
+
+    app = FastAPI()
+    app.add_exception_handler(HashingOverloadedError, hashing_overloaded_handler)
+    app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+    app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+    app.include_router(farmer.router, prefix="/farmer", tags=["Farmer"])
+    app.include_router(buyer.router, prefix="/buyer", tags=["Buyer"])
+    app.include_router(common.router, prefix="/common", tags=["Common"])
+    app.include_router(payments.router, prefix="/payments", tags=["Payments"])
+    app.include_router(deliveries.router, prefix="/deliveries", tags=["Deliveries"])
+    app.include_router(chat.router, prefix="/chat", tags=["Chat"])
+    return app
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from principals import principal_cache
+    from response_cache import response_cache
+
+    # Ids restart with every fresh database, so per-process caches must not carry over
+    response_cache.clear()
+    principal_cache.clear()
+    with TestClient(create_test_app()) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    from tokens import create_access_token
+
+    def headers(email: str):
+        return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    return headers
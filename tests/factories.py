@@ -0,0 +1,51 @@
+from datetime import datetime
+from decimal import Decimal
+from models import Buyer, Category, Farm, Farmer, Product, User
+
+# Small row builders shared by the endpoint tests. Each flushes, so ids are available; callers commit.
+
+
+def make_user(db, email: str, name: str = None, password: str = "x", **flags):
+    user = User(name=name or email.split("@")[0].title(), email=email, password=password, **flags)
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_farmer(db, email: str = "farmer@example.com", name: str = None, pending: bool = False):
+    user = make_user(db, email, name, is_farmer=True)
+    farmer = Farmer(user_id=user.id, pending=pending)
+    db.add(farmer)
+    db.flush()
+    db.add(Farm(farmer_id=farmer.id, address="1 Field Lane", size=5.0))
+    db.flush()
+    return farmer
+
+
+def make_buyer(db, email: str = "buyer@example.com", name: str = None):
+    user = make_user(db, email, name, is_buyer=True)
+    buyer = Buyer(user_id=user.id, address="2 Market St", payment_method="card")
+    db.add(buyer)
+    db.flush()
+    return buyer
+
+
+def make_category(db, name: str = "Vegetables"):
+    category = Category(name=name)
+    db.add(category)
+    db.flush()
+    return category
+
+
+def make_product(db, farmer, name: str = "Apples", quantity: int = 10, price: str = "2.50", category=None, description: str = None):
+    product = Product(
+        name=name, description=description, farmer_id=farmer.id, category_id=category.id if category else None,
+        price=Decimal(price), quantity=quantity, image_url=f"{name.lower()}.png"
+    )
+    db.add(product)
+    db.flush()
+    return product
+
+
+def order_payload(*lines):
+    return {"date": datetime(2026, 1, 1).isoformat(), "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines]}
@@ -0,0 +1,76 @@
+import pytest
+import crud
+from autocomplete import CATEGORY, PRODUCT, AutocompleteIndex, autocomplete_index, build_autocomplete_index
+from tests.factories import make_category, make_farmer, make_product
+
+
+@pytest.fixture
+def index():
+    index = AutocompleteIndex()
+    index.rebuild([
+        (PRODUCT, 1, "Green Apples"),
+        (PRODUCT, 2, "Apples"),
+        (PRODUCT, 3, "Apple Juice"),
+        (PRODUCT, 4, "Apricots"),
+        (PRODUCT, 5, "Red Potatoes"),
+        (CATEGORY, 1, "Apiary"),
+    ])
+    return index
+
+
+def names(suggestions):
+    return [suggestion["name"] for suggestion in suggestions]
+
+
+def test_names_starting_with_the_query_come_first(index):
+    # Whole-name prefixes ahead of word prefixes, then shorter names first
+    assert names(index.suggest("appl")) == ["Apples", "Apple Juice", "Green Apples"]
+    assert names(index.suggest("ap")) == ["Apiary", "Apples", "Apricots", "Apple Juice", "Green Apples"]
+    assert index.suggest("apiary") == [{"type": CATEGORY, "id": 1, "name": "Apiary"}]
+
+
+def test_limit(index):
+    assert names(index.suggest("ap", limit=2)) == ["Apiary", "Apples"]
+
+
+def test_multi_word_query_needs_every_word(index):
+    assert names(index.suggest("green ap", limit=1)) == ["Green Apples"]
+    assert names(index.suggest("apple ju", limit=1)) == ["Apple Juice"]
+    # "ap" alone would match the apples; only the trigram fallback is left
+    assert names(index.suggest("red ap")) == ["Red Potatoes"]
+
+
+def test_typos_fall_back_to_trigrams(index):
+    assert names(index.suggest("potatos"))[:1] == ["Red Potatoes"]
+    assert names(index.suggest("aprycots"))[:1] == ["Apricots"]
+    assert index.suggest("zzz") == []
+    # Too short for a trigram match to mean anything
+    assert index.suggest("xp") == []
+
+
+def test_removed_entry_is_not_suggested(index):
+    index.remove(PRODUCT, 4)
+    assert "Apricots" not in names(index.suggest("apr"))
+    assert "Apricots" not in names(index.suggest("aprycots"))
+
+    index.add(PRODUCT, 2, "Pears")
+    assert "Apples" not in names(index.suggest("appl"))
+    assert names(index.suggest("pea")) == ["Pears"]
+
+
+def test_crud_writes_update_the_shared_index(db):
+    farmer = make_farmer(db)
+    make_category(db, "Fruit")
+    make_product(db, farmer, "Plums")
+    db.commit()
+    build_autocomplete_index(db)
+    assert names(autocomplete_index.suggest("plu")) == ["Plums"]
+    assert names(autocomplete_index.suggest("fru")) == ["Fruit"]
+
+    product = crud.create_product(db, {
+        "name": "Plumcots", "farmer_id": farmer.id, "price": 3, "quantity": 5, "image_url": "plumcots.png"
+    })
+    assert names(autocomplete_index.suggest("plu")) == ["Plums", "Plumcots"]
+
+    crud.delete_product(db, product.id)
+    assert names(autocomplete_index.suggest("plu")) == ["Plums"]
@@ -0,0 +1,78 @@
+import json
+import pytest
+import fast_json
+from routers import buyer
+from tests.factories import make_farmer, make_product
+
+
+def seed(db, count: int = 7, sold_out=(2, 5)):
+    farmer = make_farmer(db)
+    products = [
+        make_product(db, farmer, f"Product {number}", quantity=0 if number in sold_out else 10)
+        for number in range(count)
+    ]
+    db.commit()
+    return [product.id for number, product in enumerate(products) if number not in sold_out]
+
+
+def browse(client, **params):
+    return client.get("/buyer/products", params=params)
+
+
+@pytest.fixture(params=[False, True], ids=["orm", "fast-json"])
+def serializer(request, monkeypatch):
+    if request.param:
+        # fast_json only imports the optional dependency when enabled at startup
+        monkeypatch.setattr(fast_json, "orjson", pytest.importorskip("orjson"), raising=False)
+    monkeypatch.setattr(buyer, "FAST_JSON_RESPONSES", request.param)
+
+
+def test_keyset_pages_walk_the_in_stock_catalog(client, db, serializer):
+    in_stock = seed(db)
+    seen = []
+    response = browse(client, limit=2)
+    while True:
+        assert response.status_code == 200
+        seen += [product["id"] for product in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert int(cursor) == seen[-1]
+        response = browse(client, limit=2, cursor=cursor)
+
+    assert seen == in_stock
+    assert all(product["quantity"] > 0 for product in response.json())
+
+
+def test_short_page_has_no_next_cursor(client, db, serializer):
+    in_stock = seed(db)
+    response = browse(client, limit=len(in_stock) + 1)
+    assert [product["id"] for product in response.json()] == in_stock
+    assert "X-Next-Cursor" not in response.headers
+    # A cursor past the end is an empty page, not an error
+    response = browse(client, cursor=in_stock[-1])
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.parametrize("limit", [0, -1, buyer.PRODUCTS_MAX_PAGE_SIZE + 1])
+def test_limit_out_of_bounds_is_rejected(client, db, limit):
+    assert browse(client, limit=limit).status_code == 422
+
+
+def test_limit_bounds_are_accepted(client, db):
+    in_stock = seed(db)
+    assert len(browse(client, limit=1).json()) == 1
+    assert len(browse(client, limit=buyer.PRODUCTS_MAX_PAGE_SIZE).json()) == len(in_stock)
+    assert len(browse(client).json()) == len(in_stock)
+
+
+def test_stream_returns_ndjson_without_sold_out_products(client, db):
+    in_stock = seed(db)
+    response = browse(client, stream="true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    products = [json.loads(line) for line in response.text.splitlines()]
+    assert [product["id"] for product in products] == in_stock
+    assert all(product["quantity"] > 0 for product in products)
+    assert products[0]["name"] == "Product 0"
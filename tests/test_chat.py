@@ -0,0 +1,186 @@
+from sqlalchemy import event, insert
+import crud
+from database import engine
+from models import ConversationReadState, Message
+from schemas import BatchMessageCreate
+from tests.factories import make_buyer, make_farmer
+
+
+def seed(db):
+    farmer = make_farmer(db, "farmer@example.com")
+    buyer = make_buyer(db, "buyer@example.com")
+    db.commit()
+    conversation = crud.get_or_create_conversation(db, farmer.id, buyer.id)
+    return farmer, buyer, conversation
+
+
+def unread(db, conversation_id: int, user_id: int):
+    db.expire_all()
+    return db.query(ConversationReadState.unread_count).filter(
+        ConversationReadState.conversation_id == conversation_id, ConversationReadState.user_id == user_id
+    ).scalar()
+
+
+def send_batch(client, headers, conversation_id: int, client_ids):
+    return client.post("/chat/messages/batch", headers=headers, json={"messages": [
+        {"conversation_id": conversation_id, "content": f"message {client_id}", "client_message_id": client_id}
+        for client_id in client_ids
+    ]})
+
+
+def test_resending_a_batch_returns_the_stored_messages(client, db, auth_headers):
+    farmer, buyer, conversation = seed(db)
+    headers = auth_headers("buyer@example.com")
+
+    first = send_batch(client, headers, conversation.id, ["a", "b"])
+    assert first.status_code == 200
+    assert [message["client_message_id"] for message in first.json()] == ["a", "b"]
+
+    # The offline queue flushed again with one new message on the end
+    second = send_batch(client, headers, conversation.id, ["a", "b", "c"])
+    assert second.status_code == 200
+    assert [message["id"] for message in second.json()[:2]] == [message["id"] for message in first.json()]
+    assert db.query(Message).count() == 3
+    assert unread(db, conversation.id, farmer.user_id) == 3
+
+
+def test_repeated_id_in_one_batch_is_stored_once(client, db, auth_headers):
+    farmer, buyer, conversation = seed(db)
+
+    response = send_batch(client, auth_headers("buyer@example.com"), conversation.id, ["a", "b", "a"])
+    assert response.status_code == 200
+    body = response.json()
+    assert [message["client_message_id"] for message in body] == ["a", "b", "a"]
+    assert body[0]["id"] == body[2]["id"]
+    assert db.query(Message).count() == 2
+    assert unread(db, conversation.id, farmer.user_id) == 2
+
+
+def test_concurrent_insert_of_the_same_batch_is_retried(db):
+    farmer, buyer, conversation = seed(db)
+    items = [
+        BatchMessageCreate(conversation_id=conversation.id, content=f"message {client_id}", client_message_id=client_id)
+        for client_id in ("a", "b")
+    ]
+    raced = []
+
+    def insert_first(conn, cursor, statement, parameters, context, executemany):
+        # Another request stores "a" between this one's lookup and its INSERT
+        if raced or not statement.startswith("INSERT INTO messages"):
+            return
+        raced.append(True)
+        with engine.begin() as other:
+            other.execute(insert(Message).values(
+                conversation_id=conversation.id, sender_id=buyer.user_id, content="message a", client_message_id="a"
+            ))
+
+    event.listen(engine, "before_cursor_execute", insert_first)
+    try:
+        messages = crud.create_messages_batch(db, buyer.user_id, items)
+    finally:
+        event.remove(engine, "before_cursor_execute", insert_first)
+
+    assert raced
+    assert [message.client_message_id for message in messages] == ["a", "b"]
+    assert db.query(Message).count() == 2
+
+
+def send(client, headers, conversation_id: int, content: str):
+    response = client.post(f"/chat/conversations/{conversation_id}/messages", headers=headers, json={"content": content})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_inbox_lists_last_message_counterparty_and_unread(client, db, auth_headers):
+    farmer, buyer, conversation = seed(db)
+    other_farmer = make_farmer(db, "grower@example.com", name="Grace Grower")
+    db.commit()
+    quiet = crud.get_or_create_conversation(db, other_farmer.id, buyer.id)
+    buyer_headers, farmer_headers = auth_headers("buyer@example.com"), auth_headers("farmer@example.com")
+
+    send(client, buyer_headers, conversation.id, "Any apples?")
+    send(client, farmer_headers, conversation.id, "Yes, ten crates")
+    last = send(client, farmer_headers, conversation.id, "Want some?")
+
+    inbox = client.get("/chat/inbox", headers=buyer_headers)
+    assert inbox.status_code == 200
+    entries = inbox.json()
+    # Conversations with messages first, newest activity on top
+    assert [entry["conversation_id"] for entry in entries] == [conversation.id, quiet.id]
+    assert entries[0]["counterparty_name"] == "Farmer"
+    assert entries[0]["last_message"]["id"] == last["id"]
+    assert entries[0]["last_message"]["content"] == "Want some?"
+    assert entries[0]["unread_count"] == 2
+    assert entries[1]["counterparty_name"] == "Grace Grower"
+    assert entries[1]["last_message"] is None
+    assert entries[1]["unread_count"] == 0
+
+    farmer_inbox = client.get("/chat/inbox", headers=farmer_headers).json()
+    assert [entry["counterparty_name"] for entry in farmer_inbox] == ["Buyer"]
+    assert farmer_inbox[0]["unread_count"] == 0
+
+
+def test_inbox_is_one_statement_regardless_of_history(db, statements):
+    farmer, buyer, conversation = seed(db)
+    for number in range(20):
+        crud.create_message(db, conversation.id, farmer.user_id if number % 2 else buyer.user_id, f"message {number}")
+
+    user_id, buyer_id = buyer.user_id, buyer.id
+    with statements:
+        entries = crud.get_inbox(db, user_id, buyer_id=buyer_id)
+    statements.assert_count(1)
+    assert entries[0]["last_message"].content == "message 19"
+    # Sending reset the buyer's counter; only the farmer's reply since is unread
+    assert entries[0]["unread_count"] == 1
+
+
+def test_unread_counters_follow_sends_and_reads(client, db, auth_headers):
+    farmer, buyer, conversation = seed(db)
+    buyer_headers, farmer_headers = auth_headers("buyer@example.com"), auth_headers("farmer@example.com")
+    first = send(client, farmer_headers, conversation.id, "one")
+    second = send(client, farmer_headers, conversation.id, "two")
+    send(client, farmer_headers, conversation.id, "three")
+
+    unread_response = client.get("/chat/unread", headers=buyer_headers).json()
+    assert unread_response["total"] == 3
+    assert [(state["conversation_id"], state["unread_count"]) for state in unread_response["conversations"]] == [(conversation.id, 3)]
+    # The sender's own messages never count
+    assert client.get("/chat/unread", headers=farmer_headers).json() == {"total": 0, "conversations": []}
+
+    # Reading up to the second message leaves only the third unread
+    partial = client.post(f"/chat/conversations/{conversation.id}/read", headers=buyer_headers, json={"message_id": second["id"]})
+    assert partial.status_code == 200
+    assert partial.json()["last_read_message_id"] == second["id"]
+    assert partial.json()["unread_count"] == 1
+    assert client.get("/chat/unread", headers=buyer_headers).json()["total"] == 1
+
+    # A cursor never moves backwards
+    stale = client.post(f"/chat/conversations/{conversation.id}/read", headers=buyer_headers, json={"message_id": first["id"]})
+    assert stale.json()["last_read_message_id"] == second["id"]
+    assert stale.json()["unread_count"] == 1
+
+    full = client.post(f"/chat/conversations/{conversation.id}/read", headers=buyer_headers, json={})
+    assert full.json()["unread_count"] == 0
+    assert client.get("/chat/unread", headers=buyer_headers).json() == {"total": 0, "conversations": []}
+
+    # Replying resets the replier's counter and bumps the other side's
+    send(client, farmer_headers, conversation.id, "four")
+    send(client, buyer_headers, conversation.id, "thanks")
+    assert unread(db, conversation.id, buyer.user_id) == 0
+    assert unread(db, conversation.id, farmer.user_id) == 1
+
+
+def test_read_rejects_foreign_messages_and_outsiders(client, db, auth_headers):
+    farmer, buyer, conversation = seed(db)
+    make_buyer(db, "outsider@example.com")
+    other_farmer = make_farmer(db, "grower@example.com")
+    db.commit()
+    elsewhere = crud.get_or_create_conversation(db, other_farmer.id, buyer.id)
+    foreign = send(client, auth_headers("grower@example.com"), elsewhere.id, "hello")
+
+    response = client.post(
+        f"/chat/conversations/{conversation.id}/read", headers=auth_headers("buyer@example.com"), json={"message_id": foreign["id"]}
+    )
+    assert response.status_code == 400
+    response = client.post(f"/chat/conversations/{conversation.id}/read", headers=auth_headers("outsider@example.com"), json={})
+    assert response.status_code == 403
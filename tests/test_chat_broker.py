@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import fakeredis
+import chat_broker
+from chat_broker import InProcessBroker, RedisBroker, user_channel
+from models import Buyer, Conversation, ConversationReadState, Farmer, User
+
+
+async def receive(subscription, timeout: float = 2.0):
+    return await asyncio.wait_for(subscription.__anext__(), timeout)
+
+
+def test_in_process_publish_reaches_subscriber():
+    broker = InProcessBroker()
+
+    async def scenario():
+        async with broker.subscribe("chat:user:1") as subscription:
+            # crud publishes from threadpool workers, not from the event loop
+            publisher = threading.Thread(target=broker.publish, args=("chat:user:1", "hello"))
+            publisher.start()
+            publisher.join()
+            assert await receive(subscription) == "hello"
+        assert not broker.has_subscribers("chat:user:1")
+
+    asyncio.run(scenario())
+
+
+def test_in_process_publish_skips_other_channels():
+    broker = InProcessBroker()
+
+    async def scenario():
+        async with broker.subscribe("chat:user:1") as subscription:
+            assert broker.publish("chat:user:2", "not for you") == 0
+            assert broker.publish("chat:user:1", "for you") == 1
+            assert await receive(subscription) == "for you"
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_drops_oldest_messages():
+    async def scenario():
+        subscription = chat_broker.Subscription(asyncio.get_running_loop(), max_size=2)
+        for message in ("1", "2", "3"):
+            subscription.deliver(message)
+        await asyncio.sleep(0)
+        assert [await receive(subscription), await receive(subscription)] == ["2", "3"]
+
+    asyncio.run(scenario())
+
+
+def redis_broker(server):
+    return RedisBroker(fakeredis.FakeRedis(server=server), fakeredis.FakeAsyncRedis(server=server))
+
+
+def test_redis_broker_fans_out_across_instances():
+    server = fakeredis.FakeServer()
+    # Two workers: one holds the socket, the other handles the request that publishes
+    socket_worker, request_worker = redis_broker(server), redis_broker(server)
+
+    async def scenario():
+        async with socket_worker.subscribe("chat:user:7") as subscription:
+            assert await asyncio.to_thread(request_worker.publish, "chat:user:7", "hello") == 1
+            assert await receive(subscription) == "hello"
+        assert request_worker.publish("chat:user:7", "gone") == 0
+
+    asyncio.run(scenario())
+
+
+def test_redis_broker_publish_fails_open():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    assert redis_broker(server).publish("chat:user:1", "hello") == 0
+
+
+def seed_conversation(db):
+    farmer_user = User(name="Farmer", email="farmer@example.com", password="x", is_farmer=True)
+    buyer_user = User(name="Buyer", email="buyer@example.com", password="x", is_buyer=True)
+    db.add_all([farmer_user, buyer_user])
+    db.flush()
+    farmer = Farmer(user_id=farmer_user.id, pending=False)
+    buyer = Buyer(user_id=buyer_user.id)
+    db.add_all([farmer, buyer])
+    db.flush()
+    conversation = Conversation(farmer_id=farmer.id, buyer_id=buyer.id)
+    db.add(conversation)
+    db.flush()
+    db.add_all([
+        ConversationReadState(conversation_id=conversation.id, user_id=user.id, unread_count=0)
+        for user in (farmer_user, buyer_user)
+    ])
+    db.commit()
+    return conversation.id, farmer_user.id
+
+
+def test_sent_message_is_pushed_over_websocket(client, db, auth_headers):
+    conversation_id, farmer_user_id = seed_conversation(db)
+    token = auth_headers("farmer@example.com")["Authorization"].split()[1]
+    with client.websocket_connect(f"/chat/ws?token={token}") as socket:
+        deadline = time.monotonic() + 2
+        while not chat_broker.broker.has_subscribers(user_channel(farmer_user_id)):
+            assert time.monotonic() < deadline, "socket never subscribed"
+            time.sleep(0.01)
+        response = client.post(
+            f"/chat/conversations/{conversation_id}/messages",
+            headers=auth_headers("buyer@example.com"),
+            json={"content": "Are the apples ripe?"},
+        )
+        assert response.status_code == 200
+        pushed = socket.receive_json()
+    assert pushed["type"] == "message"
+    assert pushed["conversation_id"] == conversation_id
+    assert pushed["content"] == "Are the apples ripe?"
@@ -0,0 +1,23 @@
+import asyncio
+from sqlalchemy import text
+import database
+
+
+def test_async_engine_uses_instrumented_pool_settings():
+    options = database.engine_options("postgresql+asyncpg://user@localhost/market", database.InstrumentedAsyncQueuePool)
+    assert options["poolclass"] is database.InstrumentedAsyncQueuePool
+    assert options["pool_size"] == database.DB_POOL_SIZE
+    assert options["pool_pre_ping"] == database.DB_POOL_PRE_PING
+    pool = database.InstrumentedAsyncQueuePool(lambda: None, pool_size=3)
+    assert pool._is_asyncio and pool.stats is database.async_pool_stats
+
+
+def test_pool_status_includes_async_pool(db):
+    async def query():
+        async with database.get_async_sessionmaker()() as session:
+            return await session.scalar(text("SELECT 1"))
+
+    assert asyncio.run(query()) == 1
+    status = database.get_pool_status()
+    assert status["async"]["connects"] >= 1
+    assert "wait_seconds" in status
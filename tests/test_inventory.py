@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from inventory import CONFIRMED, HELD, release_expired_holds
+from models import InventoryHold, Order, Payment, Product
+from tests.factories import make_buyer, make_farmer, make_product, order_payload
+
+
+def seed(db):
+    farmer = make_farmer(db)
+    make_buyer(db)
+    apples = make_product(db, farmer, "Apples", quantity=5)
+    honey = make_product(db, farmer, "Honey", quantity=1)
+    db.commit()
+    return apples.id, honey.id
+
+
+def stock(db, *product_ids):
+    db.expire_all()
+    return [db.get(Product, product_id).quantity for product_id in product_ids]
+
+
+def place_order(client, auth_headers, *lines):
+    return client.post("/buyer/orders", headers=auth_headers("buyer@example.com"), json=order_payload(*lines))
+
+
+def pay(client, order_id):
+    return client.post("/payments/payments", json={"order_id": order_id, "amount": 10, "payment_method": "card"})
+
+
+def expire_holds(db, order_id):
+    db.query(InventoryHold).filter(InventoryHold.order_id == order_id).update(
+        {InventoryHold.expires_at: datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+
+
+def test_short_line_rejects_whole_cart_and_keeps_stock(client, db, auth_headers):
+    apples, honey = seed(db)
+    response = place_order(client, auth_headers, (apples, 2), (honey, 2))
+    assert response.status_code == 409
+    assert stock(db, apples, honey) == [5, 1]
+    assert db.query(Order).count() == 0
+    assert db.query(InventoryHold).count() == 0
+
+
+def test_order_reserves_stock_and_holds_it(client, db, auth_headers):
+    apples, honey = seed(db)
+    response = place_order(client, auth_headers, (apples, 2), (honey, 1))
+    assert response.status_code == 200
+    assert stock(db, apples, honey) == [3, 0]
+    holds = db.query(InventoryHold).filter(InventoryHold.order_id == response.json()["id"]).all()
+    assert sorted((hold.product_id, hold.quantity, hold.status) for hold in holds) == [(apples, 2, HELD), (honey, 1, HELD)]
+
+
+def test_sweeper_restocks_expired_holds_once_and_expires_order(client, db, auth_headers):
+    apples, honey = seed(db)
+    order_id = place_order(client, auth_headers, (apples, 2), (honey, 1)).json()["id"]
+    expire_holds(db, order_id)
+
+    assert release_expired_holds(db) == 2
+    assert stock(db, apples, honey) == [5, 1]
+    assert db.get(Order, order_id).status == "expired"
+    # A second sweep finds nothing left to return
+    assert release_expired_holds(db) == 0
+    assert stock(db, apples, honey) == [5, 1]
+
+
+def test_sweeper_leaves_live_holds_alone(client, db, auth_headers):
+    apples, _ = seed(db)
+    order_id = place_order(client, auth_headers, (apples, 2)).json()["id"]
+    assert release_expired_holds(db) == 0
+    assert stock(db, apples) == [3]
+    assert db.get(Order, order_id).status == "pending"
+
+
+def test_paying_expired_order_is_409_without_payment(client, db, auth_headers):
+    apples, _ = seed(db)
+    order_id = place_order(client, auth_headers, (apples, 2)).json()["id"]
+    expire_holds(db, order_id)
+    release_expired_holds(db)
+
+    response = pay(client, order_id)
+    assert response.status_code == 409
+    assert db.query(Payment).count() == 0
+
+
+def test_paying_live_order_confirms_holds(client, db, auth_headers):
+    apples, _ = seed(db)
+    order_id = place_order(client, auth_headers, (apples, 2)).json()["id"]
+    assert pay(client, order_id).status_code == 200
+    assert db.query(Payment).filter(Payment.order_id == order_id).count() == 1
+
+    # Past the original expiry the sweeper must not return sold stock
+    expire_holds(db, order_id)
+    assert release_expired_holds(db) == 0
+    assert stock(db, apples) == [3]
+    db.expire_all()
+    assert {hold.status for hold in db.query(InventoryHold).filter(InventoryHold.order_id == order_id)} == {CONFIRMED}
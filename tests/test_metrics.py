@@ -0,0 +1,58 @@
+import re
+import pytest
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+import metrics
+from metrics import MetricsMiddleware, render_metrics
+from response_cache import response_cache
+from tests.conftest import create_test_app
+from tests.factories import make_category, make_farmer, make_product
+
+
+@pytest.fixture
+def metrics_client(db, monkeypatch):
+    for histogram in metrics.REQUEST_HISTOGRAMS:
+        monkeypatch.setattr(histogram, "_series", {})
+    response_cache.clear()
+    app = create_test_app()
+    app.add_middleware(MetricsMiddleware)
+
+    # As mounted in main.py
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    with TestClient(app) as client:
+        yield client
+
+
+def sample(text: str, name: str, route: str, status: str = "200"):
+    match = re.search(rf'^{name}{{method="GET",route="{re.escape(route)}",status="{status}"}} (\S+)$', text, re.MULTILINE)
+    assert match, f"no {name} sample for {route}"
+    return float(match.group(1))
+
+
+def test_request_is_labelled_by_route_template(metrics_client, db):
+    product = make_product(db, make_farmer(db), category=make_category(db))
+    db.commit()
+    response = metrics_client.get(f"/buyer/products/{product.id}")
+    assert response.status_code == 200
+
+    exposition = metrics_client.get("/metrics")
+    assert exposition.status_code == 200
+    text = exposition.text
+    route = "/buyer/products/{product_id}"
+    assert f"/buyer/products/{product.id}" not in text
+    assert sample(text, "http_request_duration_seconds_count", route) == 1
+    assert sample(text, "http_request_db_statements_sum", route) > 0
+    assert sample(text, "http_request_db_seconds_count", route) == 1
+    assert sample(text, "http_response_size_bytes_sum", route) == len(response.content)
+    assert "db_pool_checkout_wait_seconds_count" in text
+
+
+def test_unmatched_paths_share_one_label(metrics_client, db):
+    assert metrics_client.get("/no/such/path").status_code == 404
+    assert metrics_client.get("/another/missing/path").status_code == 404
+    text = metrics_client.get("/metrics").text
+    assert sample(text, "http_request_duration_seconds_count", metrics.UNMATCHED_ROUTE, "404") == 2
+    assert sample(text, "http_request_db_statements_sum", metrics.UNMATCHED_ROUTE, "404") == 0
@@ -0,0 +1,46 @@
+from datetime import datetime
+from decimal import Decimal
+from crud import create_order
+from models import Buyer, Farmer, Product, User
+from schemas import OrderCreate
+
+
+def seed_products(db):
+    farmer_user = User(name="Farmer", email="farmer@example.com", password="x", is_farmer=True)
+    buyer_user = User(name="Buyer", email="buyer@example.com", password="x", is_buyer=True)
+    db.add_all([farmer_user, buyer_user])
+    db.flush()
+    farmer = Farmer(user_id=farmer_user.id, pending=False)
+    buyer = Buyer(user_id=buyer_user.id)
+    db.add_all([farmer, buyer])
+    db.flush()
+    apples = Product(name="Apples", farmer_id=farmer.id, price=Decimal("1.25"), quantity=10)
+    honey = Product(name="Honey", farmer_id=farmer.id, price=Decimal("7.99"), quantity=10)
+    db.add_all([apples, honey])
+    db.commit()
+    return buyer, apples, honey
+
+
+def test_order_total_and_item_prices_keep_cents(db):
+    buyer, apples, honey = seed_products(db)
+    order_data = OrderCreate(buyer_id=buyer.id, date=datetime(2026, 1, 1), items=[
+        {"product_id": apples.id, "quantity": 3},
+        {"product_id": honey.id, "quantity": 1},
+    ])
+    order = create_order(db, order_data)
+    db.expire_all()
+    assert order.amount == Decimal("11.74")
+    assert sorted(item.price for item in order.items) == [Decimal("1.25"), Decimal("7.99")]
+
+
+def test_client_sent_prices_are_ignored(db):
+    buyer, apples, _ = seed_products(db)
+    order_data = OrderCreate.model_validate({
+        "buyer_id": buyer.id,
+        "date": "2026-01-01T00:00:00",
+        "amount": 0.01,
+        "items": [{"product_id": apples.id, "quantity": 2, "price": 0.01}],
+    })
+    order = create_order(db, order_data)
+    assert order.amount == Decimal("2.50")
+    assert order.items[0].price == Decimal("1.25")
@@ -0,0 +1,70 @@
+import threading
+import pytest
+import crud
+from models import User
+from passwords import HashingOverloadedError, PasswordHasher, check_password, is_hashed, needs_rehash
+from tests.factories import make_buyer
+
+
+def test_hash_round_trip():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    stored = hasher.hash("hunter2")
+    assert is_hashed(stored) and not needs_rehash(stored)
+    assert hasher.verify("hunter2", stored)
+    assert not hasher.verify("hunter3", stored)
+
+
+def test_plaintext_rows_still_verify():
+    assert check_password("secret", "secret")
+    assert not check_password("secret", "Secret")
+    assert needs_rehash("secret")
+
+
+def test_full_pool_sheds_new_work():
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+    release = threading.Event()
+    running = hasher._submit(release.wait)
+    waiting = hasher._submit(release.wait)
+    try:
+        with pytest.raises(HashingOverloadedError):
+            hasher.hash("hunter2")
+    finally:
+        release.set()
+    running.result()
+    waiting.result()
+    # Slots come back once the jobs finish
+    assert hasher.verify("hunter2", hasher.hash("hunter2"))
+
+
+def test_login_returns_503_while_hashing_is_overloaded(client, db, monkeypatch):
+    make_buyer(db, "buyer@example.com")
+    db.commit()
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    release = threading.Event()
+    blocker = hasher._submit(release.wait)
+    monkeypatch.setattr(crud, "password_hasher", hasher)
+    try:
+        response = client.post("/buyer/login", json={"email": "buyer@example.com", "password": "x"})
+    finally:
+        release.set()
+        blocker.result()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_rehashes_plaintext_password(client, db):
+    buyer = make_buyer(db, "buyer@example.com")
+    db.commit()
+    user_id = buyer.user_id
+    assert not is_hashed(db.get(User, user_id).password)
+
+    response = client.post("/buyer/login", json={"email": "buyer@example.com", "password": "x"})
+    assert response.status_code == 200
+
+    db.expire_all()
+    stored = db.get(User, user_id).password
+    assert is_hashed(stored) and check_password("x", stored)
+    # The upgraded hash keeps working
+    assert client.post("/buyer/login", json={"email": "buyer@example.com", "password": "x"}).status_code == 200
+    assert client.post("/buyer/login", json={"email": "buyer@example.com", "password": "y"}).status_code == 403
@@ -0,0 +1,81 @@
+import pytest
+import crud
+import principals
+from principals import Principal, PrincipalCache, principal_cache
+from tests.factories import make_farmer
+
+
+@pytest.fixture
+def cached_farmer(db):
+    principal_cache.clear()
+    farmer = make_farmer(db, "farmer@example.com", pending=True)
+    db.commit()
+    principal_cache.put("farmer@example.com", crud.load_principal(db, "farmer@example.com"))
+    assert principal_cache.get("farmer@example.com").farmer_pending
+    return farmer
+
+
+def principal(id: int, email: str):
+    return Principal(
+        id=id, name=email, email=email, phone_number=None, is_admin=False, is_buyer=True, is_farmer=False
+    )
+
+
+def test_approve_farmer_invalidates(db, cached_farmer):
+    crud.approve_farmer(db, cached_farmer.id)
+    assert principal_cache.get("farmer@example.com") is None
+    assert crud.load_principal(db, "farmer@example.com").farmer_pending is False
+
+
+def test_disable_user_invalidates(db, cached_farmer):
+    crud.disable_user(db, cached_farmer.user_id)
+    assert principal_cache.get("farmer@example.com") is None
+
+
+def test_enable_user_invalidates(db, cached_farmer):
+    crud.enable_user(db, cached_farmer.user_id)
+    assert principal_cache.get("farmer@example.com") is None
+
+
+def test_delete_user_invalidates(db, cached_farmer):
+    crud.delete_user(db, cached_farmer.user_id)
+    assert principal_cache.get("farmer@example.com") is None
+    assert crud.load_principal(db, "farmer@example.com") is None
+
+
+def test_other_users_stay_cached(db, cached_farmer):
+    principal_cache.put("buyer@example.com", principal(999, "buyer@example.com"))
+    crud.disable_user(db, cached_farmer.user_id)
+    assert principal_cache.get("buyer@example.com") is not None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principals.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(ttl=60, max_size=10)
+    cache.put("a@example.com", principal(1, "a@example.com"))
+
+    now[0] += 59
+    assert cache.get("a@example.com") is not None
+    now[0] += 2
+    assert cache.get("a@example.com") is None
+    # The expired entry is gone, so invalidating its user is a no-op
+    cache.invalidate_user(1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(ttl=60, max_size=2)
+    cache.put("a@example.com", principal(1, "a@example.com"))
+    cache.put("b@example.com", principal(2, "b@example.com"))
+    # Reading "a" makes "b" the oldest
+    assert cache.get("a@example.com") is not None
+    cache.put("c@example.com", principal(3, "c@example.com"))
+
+    assert cache.get("b@example.com") is None
+    assert cache.get("a@example.com") is not None
+    assert cache.get("c@example.com") is not None
+    # The evicted user's id mapping went with it
+    cache.put("b@example.com", principal(2, "b@example.com"))
+    cache.invalidate_user(2)
+    assert cache.get("b@example.com") is None
+    assert cache.get("c@example.com") is not None
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from crud import create_farmer
+from models import Category, Product
+from schemas import FarmerCreate
+
+
+def seed_product(db):
+    farmer = create_farmer(db, FarmerCreate(
+        name="Farmer", email="farmer@example.com", password="secret", farm_address="1 Field Lane", farm_size=12.5
+    ))["farmer"]
+    category = Category(name="Fruit")
+    db.add(category)
+    db.flush()
+    product = Product(
+        name="Apples", description="Crisp", farmer_id=farmer.id, category_id=category.id,
+        price=Decimal("1.25"), quantity=10, image_url="apples.png"
+    )
+    db.add(product)
+    db.commit()
+    return product.id
+
+
+def test_product_detail_includes_farmer_and_farm(client, db):
+    product_id = seed_product(db)
+    response = client.get(f"/buyer/products/{product_id}")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["name"] == "Apples"
+    assert body["farmer"]["farm_address"] == "1 Field Lane"
+    assert body["farmer"]["farm_size"] == 12.5
+    assert body["farmer"]["user"]["email"] == "farmer@example.com"
+
+
+def test_missing_product_is_404(client, db):
+    assert client.get("/buyer/products/999").status_code == 404
+
+
+def test_product_detail_revalidates_with_etag(client, db):
+    product_id = seed_product(db)
+    first = client.get(f"/buyer/products/{product_id}")
+    etag = first.headers["ETag"]
+    assert etag.startswith("W/")
+
+    cached = client.get(f"/buyer/products/{product_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+
+def test_product_update_changes_etag(client, db, auth_headers):
+    product_id = seed_product(db)
+    etag = client.get(f"/buyer/products/{product_id}").headers["ETag"]
+
+    update = client.put(f"/farmer/products/{product_id}", headers=auth_headers("farmer@example.com"), json={
+        "image_url": "apples.png", "name": "Green apples", "price": 1.5, "quantity": 8,
+        "description": "Crisp", "category_id": 1,
+    })
+    assert update.status_code == 200
+
+    response = client.get(f"/buyer/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["name"] == "Green apples"
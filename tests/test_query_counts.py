@@ -0,0 +1,111 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from response_cache import response_cache
+from models import Buyer, Category, Farm, Farmer, Order, OrderItem, Product, User
+
+# Each read path is pinned to a constant number of statements, whatever the number of rows.
+# Requests are warmed up first so the principal cache does not add its lookup to the count.
+
+
+def seed(db, orders: int, product_count: int = 3):
+    farmer_user = User(name="Farmer", email="farmer@example.com", password="x", is_farmer=True)
+    buyer_user = User(name="Buyer", email="buyer@example.com", password="x", is_buyer=True)
+    db.add_all([farmer_user, buyer_user])
+    db.flush()
+    farmer = Farmer(user_id=farmer_user.id, pending=False)
+    buyer = Buyer(user_id=buyer_user.id)
+    db.add_all([farmer, buyer])
+    db.flush()
+    category = Category(name="Vegetables")
+    db.add_all([Farm(farmer_id=farmer.id, address="1 Field Lane", size=3.0), category])
+    db.flush()
+    products = [
+        Product(name=f"Product {i}", farmer_id=farmer.id, category_id=category.id, price=Decimal("2.00"), quantity=5, image_url=f"{i}.png")
+        for i in range(product_count)
+    ]
+    db.add_all(products)
+    db.flush()
+    for i in range(orders):
+        order = Order(buyer_id=buyer.id, date=datetime(2026, 1, 1), status="pending", amount=Decimal("4.00"))
+        db.add(order)
+        db.flush()
+        db.add_all([
+            OrderItem(order_id=order.id, product_id=product.id, quantity=1, price=Decimal("2.00"))
+            for product in products[:2]
+        ])
+    db.commit()
+    return products[0].id
+
+
+def count_request(client, statements, path: str, headers: dict = None):
+    assert client.get(path, headers=headers).status_code == 200
+    with statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize("orders", [1, 8])
+def test_buyer_orders_statement_count(client, db, statements, auth_headers, orders):
+    seed(db, orders)
+    response = count_request(client, statements, "/buyer/orders", auth_headers("buyer@example.com"))
+    assert len(response.json()) == orders
+    # Orders, then all their items in one SELECT ... IN
+    statements.assert_count(2)
+
+
+@pytest.mark.parametrize("orders", [1, 8])
+def test_farmer_orders_statement_count(client, db, statements, auth_headers, orders):
+    seed(db, orders)
+    response = count_request(client, statements, "/farmer/orders", auth_headers("farmer@example.com"))
+    assert len(response.json()) == orders
+    statements.assert_count(2)
+
+
+def test_product_detail_statement_count(client, db, statements):
+    product_id = seed(db, 1)
+    with statements:
+        response = client.get(f"/buyer/products/{product_id}")
+    assert response.status_code == 200
+    # Version lookup, then product, farmer, user and farms in one joined SELECT
+    statements.assert_count(2)
+
+    with statements:
+        assert client.get(f"/buyer/products/{product_id}").status_code == 200
+    # Served from the response cache after the version lookup
+    statements.assert_count(1)
+
+    response_cache.clear()
+    with statements:
+        assert client.get(f"/buyer/products/{product_id}", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    statements.assert_count(1)
+
+
+@pytest.mark.parametrize("products", [3, 12])
+def test_catalog_statement_count(client, db, statements, products):
+    seed(db, 0, products)
+    response = count_request(client, statements, "/buyer/products")
+    assert len(response.json()) == products
+    statements.assert_count(1)
+
+
+@pytest.mark.parametrize("products", [3, 12])
+def test_farmer_products_statement_count(client, db, statements, auth_headers, products):
+    seed(db, 0, products)
+    response = count_request(client, statements, "/farmer/products", auth_headers("farmer@example.com"))
+    assert len(response.json()) == products
+    statements.assert_count(1)
+
+
+@pytest.mark.parametrize("users", [0, 10])
+def test_admin_users_statement_count(client, db, statements, auth_headers, users):
+    seed(db, 0)
+    db.add_all([User(name="Admin", email="admin@example.com", password="x", is_admin=True)] + [
+        User(name=f"User {i}", email=f"user{i}@example.com", password="x", is_buyer=True) for i in range(users)
+    ])
+    db.commit()
+    response = count_request(client, statements, "/admin/users", auth_headers("admin@example.com"))
+    # The seeded farmer and buyer are listed too; the admin is not
+    assert len(response.json()) == users + 2
+    statements.assert_count(1)
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from crud import get_available_products, get_buyer_orders, get_messages
+from models import Buyer, Category, Conversation, Farmer, Message, Order, OrderItem, Product, User
+
+
+def seed(db):
+    farmer_user = User(name="Farmer", email="farmer@example.com", password="x", is_farmer=True)
+    buyer_user = User(name="Buyer", email="buyer@example.com", password="x", is_buyer=True)
+    db.add_all([farmer_user, buyer_user])
+    db.flush()
+    farmer = Farmer(user_id=farmer_user.id, pending=False)
+    buyer = Buyer(user_id=buyer_user.id)
+    category = Category(name="Vegetables")
+    db.add_all([farmer, buyer, category])
+    db.flush()
+    products = [
+        Product(name=f"Product {i}", farmer_id=farmer.id, category_id=category.id, price=Decimal("1.50"), quantity=i % 3)
+        for i in range(30)
+    ]
+    db.add_all(products)
+    db.flush()
+    for i in range(10):
+        order = Order(buyer_id=buyer.id, status="pending", amount=0)
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=products[i].id, quantity=1, price=1))
+    conversation = Conversation(buyer_id=buyer.id, farmer_id=farmer.id)
+    db.add(conversation)
+    db.flush()
+    start = datetime(2026, 1, 1)
+    db.add_all([
+        Message(conversation_id=conversation.id, sender_id=buyer_user.id, content=str(i), timestamp=start + timedelta(minutes=i))
+        for i in range(30)
+    ])
+    db.commit()
+    return buyer, conversation
+
+
+def query_plans(db, recorded):
+    plans = []
+    for statement, parameters in recorded:
+        rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+def assert_indexed(plans, table: str, index: str):
+    touching = [(statement, plan) for statement, plan in plans if f"FROM {table}" in statement or f'FROM "{table}"' in statement]
+    assert touching, f"no statement read {table}"
+    for statement, plan in touching:
+        # A bare "SCAN <table>" is a full table scan; "SCAN <table> USING INDEX" walks an index
+        assert not any(step in (f"SCAN {table}", f"SCAN {table} AS {table}") for step in plan), (statement, plan)
+    assert any(index in step for _, plan in touching for step in plan), touching
+
+
+def test_available_products_use_in_stock_index(db, statements):
+    seed(db)
+    with statements:
+        get_available_products(db, after_id=5, limit=10)
+    assert_indexed(query_plans(db, statements.statements), "products", "ix_products_in_stock")
+
+
+def test_order_items_are_looked_up_by_order(db, statements):
+    buyer, _ = seed(db)
+    with statements:
+        get_buyer_orders(db, buyer.id)
+    plans = query_plans(db, statements.statements)
+    assert_indexed(plans, "orders", "ix_orders_buyer_id")
+    assert_indexed(plans, "orderItems", "ix_orderItems_order_id")
+
+
+def test_messages_are_paged_by_conversation(db, statements):
+    _, conversation = seed(db)
+    with statements:
+        page = get_messages(db, conversation.id, limit=10)
+        get_messages(db, conversation.id, before_id=page[0].id, limit=10)
+    assert_indexed(query_plans(db, statements.statements), "messages", "ix_messages_conversation_id_timestamp_id")
@@ -0,0 +1,111 @@
+import asyncio
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import rate_limit
+from rate_limit import LoginRateLimiter, LoginRateLimitMiddleware, MemoryBackend, RedisBackend, take_token
+
+
+def test_take_token_spends_burst_then_refills():
+    tokens, now = 3.0, 100.0
+    for _ in range(3):
+        allowed, tokens, retry_after = take_token(tokens, now, now, rate=1.0, burst=3)
+        assert allowed and retry_after == 0
+    allowed, tokens, retry_after = take_token(tokens, now, now, rate=1.0, burst=3)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    allowed, tokens, _ = take_token(tokens, now, now + 1.5, rate=1.0, burst=3)
+    assert allowed and tokens == pytest.approx(0.5)
+
+
+def test_take_token_refill_is_capped_at_burst():
+    allowed, tokens, _ = take_token(0.0, 0.0, 3600.0, rate=1.0, burst=3)
+    assert allowed and tokens == 2
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryBackend()
+    return RedisBackend(fakeredis.FakeAsyncRedis())
+
+
+def test_backend_burst_then_refill(backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(rate_limit.time, "time", lambda: clock[0])
+
+    async def scenario():
+        results = [await backend.take("ip:1.2.3.4", 1.0, 2) for _ in range(3)]
+        assert [allowed for allowed, _ in results] == [True, True, False]
+        assert results[-1][1] == pytest.approx(1.0)
+        clock[0] += 1.0
+        assert (await backend.take("ip:1.2.3.4", 1.0, 2))[0]
+
+    asyncio.run(scenario())
+
+
+def test_ip_bucket_limits_many_accounts_from_one_address(backend):
+    limiter = LoginRateLimiter(backend)
+
+    async def scenario():
+        waits = [await limiter.check("1.2.3.4", f"user{i}@example.com") for i in range(int(rate_limit.LOGIN_RATE_IP_BURST) + 1)]
+        assert all(wait == 0 for wait in waits[:-1])
+        assert waits[-1] > 0
+        assert await limiter.check("5.6.7.8", "other@example.com") == 0
+
+    asyncio.run(scenario())
+
+
+def test_account_bucket_limits_one_account_from_many_addresses(backend):
+    limiter = LoginRateLimiter(backend)
+
+    async def scenario():
+        burst = int(rate_limit.LOGIN_RATE_ACCOUNT_BURST)
+        waits = [await limiter.check(f"10.0.0.{i}", "victim@example.com") for i in range(burst + 1)]
+        assert all(wait == 0 for wait in waits[:-1])
+        assert waits[-1] > 0
+        assert await limiter.check("10.0.0.99", "someone@example.com") == 0
+
+    asyncio.run(scenario())
+
+
+def test_redis_outage_fails_open():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    backend = RedisBackend(fakeredis.FakeAsyncRedis(server=server))
+    assert asyncio.run(backend.take("ip:1.2.3.4", 1.0, 1)) == (True, 0.0)
+
+
+def login_app(backend):
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login(payload: dict):
+        return {"email": payload["email"]}
+
+    app.add_middleware(LoginRateLimitMiddleware, limiter=LoginRateLimiter(backend))
+    return app
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "redis"])
+def test_middleware_answers_429_with_retry_after(backend_name):
+    backend = MemoryBackend() if backend_name == "memory" else RedisBackend(fakeredis.FakeAsyncRedis())
+    with TestClient(login_app(backend)) as client:
+        burst = int(rate_limit.LOGIN_RATE_ACCOUNT_BURST)
+        for _ in range(burst):
+            response = client.post("/auth/login", json={"email": "Victim@Example.com", "password": "guess"})
+            # The buffered body is replayed to the route intact
+            assert response.status_code == 200 and response.json() == {"email": "Victim@Example.com"}
+        throttled = client.post("/auth/login", json={"email": "victim@example.com", "password": "guess"})
+        assert throttled.status_code == 429
+        assert int(throttled.headers["Retry-After"]) >= 1
+        # Other accounts are still limited only by the shared IP bucket
+        assert client.post("/auth/login", json={"email": "other@example.com", "password": "x"}).status_code == 200
+
+
+def test_login_account_from_json_and_form_bodies():
+    assert rate_limit.login_account("application/json", b'{"email": " Buyer@X.com "}') == "buyer@x.com"
+    assert rate_limit.login_account("application/x-www-form-urlencoded", b"username=Farmer%40x.com&password=p") == "farmer@x.com"
+    assert rate_limit.login_account("application/json", b"not json") is None
+    assert rate_limit.login_account("text/plain", b"email=a@b.c") is None
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from models import AuthSession
+from passwords import hash_password
+from tokens import REFRESH_TOKEN_REUSE_WINDOW_HOURS, hash_refresh_token, refresh_revocations
+from tests.factories import make_buyer
+
+
+def login(client, db):
+    buyer = make_buyer(db)
+    buyer.user.password = hash_password("secret")
+    db.commit()
+    response = client.post("/auth/login", data={"username": "buyer@example.com", "password": "secret"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_the_token(client, db):
+    tokens = login(client, db)
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert client.get("/auth/user", headers={"Authorization": f"Bearer {rotated['access_token']}"}).status_code == 200
+    assert refresh(client, rotated["refresh_token"]).status_code == 200
+
+
+def test_reusing_a_rotated_token_revokes_the_family(client, db):
+    first = login(client, db)["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+
+    reused = refresh(client, first)
+    assert reused.status_code == 401
+    # The legitimate holder's current token dies with the family
+    assert refresh(client, second).status_code == 401
+
+
+def test_expired_refresh_token_is_rejected(client, db):
+    token = login(client, db)["refresh_token"]
+    db.query(AuthSession).update({AuthSession.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert refresh(client, token).status_code == 401
+
+
+def test_logout_revokes_access_token_and_refresh_family(client, db):
+    tokens = login(client, db)
+    first = tokens["refresh_token"]
+    current = refresh(client, first).json()
+    headers = {"Authorization": f"Bearer {current['access_token']}"}
+
+    # Logging out with any token of the family ends the whole login
+    response = client.post("/auth/logout", headers=headers, json={"refresh_token": first})
+    assert response.status_code == 200
+    assert refresh(client, current["refresh_token"]).status_code == 401
+    assert client.get("/auth/user", headers=headers).status_code == 401
+
+
+def test_refresher_prunes_rotated_sessions_past_the_reuse_window(client, db):
+    token = login(client, db)["refresh_token"]
+    for _ in range(3):
+        token = refresh(client, token).json()["refresh_token"]
+    db.expire_all()
+    assert db.query(AuthSession).count() == 4
+
+    refresh_revocations(db, now=datetime.utcnow() + timedelta(hours=REFRESH_TOKEN_REUSE_WINDOW_HOURS, minutes=1))
+    remaining = db.query(AuthSession).all()
+    assert [session.token_hash for session in remaining] == [hash_refresh_token(token)]
+    assert remaining[0].revoked_at is None
@@ -0,0 +1,45 @@
+import fakeredis
+import pytest
+from response_cache import MemoryBackend, RedisBackend, ResponseCache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    if request.param == "memory":
+        return ResponseCache(MemoryBackend(max_entries=2), ttl=60)
+    return ResponseCache(RedisBackend(fakeredis.FakeRedis()), ttl=60)
+
+
+def test_put_get_invalidate(cache):
+    cache.put("categories", b"[]")
+    assert cache.get("categories") == b"[]"
+    cache.invalidate("categories")
+    assert cache.get("categories") is None
+
+
+def test_clear(cache):
+    cache.put("product:1:1", b"{}")
+    cache.put("product:2:1", b"{}")
+    cache.clear()
+    assert cache.get("product:1:1") is None and cache.get("product:2:1") is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = ResponseCache(MemoryBackend(max_entries=2), ttl=60)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+
+
+def test_redis_outage_degrades_every_operation():
+    server = fakeredis.FakeServer()
+    cache = ResponseCache(RedisBackend(fakeredis.FakeRedis(server=server)), ttl=60)
+    server.connected = False
+    cache.put("categories", b"[]")
+    assert cache.get("categories") is None
+    cache.invalidate("categories")
+    cache.clear()
+
@@ -0,0 +1,90 @@
+from sqlalchemy import text
+from models import Product
+from search import search_products
+from tests.factories import make_farmer, make_product
+
+
+def seed(db):
+    farmer = make_farmer(db)
+    products = [
+        make_product(db, farmer, "Apples", description="Crisp red apples"),
+        make_product(db, farmer, "Apricots", description="Sweet and soft"),
+        make_product(db, farmer, "Carrots", description="Orange, good with apples"),
+        make_product(db, farmer, "Potatoes", description="Floury"),
+    ]
+    db.commit()
+    return products
+
+
+def names(products):
+    return sorted(product.name for product in products)
+
+
+def total_changes(db):
+    # Counts rows written by triggers as well as by the statement itself
+    return db.execute(text("SELECT total_changes()")).scalar()
+
+
+def test_matches_name_and_description(db):
+    seed(db)
+    assert names(search_products(db, "apples")) == ["Apples", "Carrots"]
+    assert names(search_products(db, "floury potatoes")) == ["Potatoes"]
+    assert search_products(db, "bananas") == []
+    assert search_products(db, "  !? ") == []
+
+
+def test_terms_match_as_prefixes(db):
+    seed(db)
+    assert names(search_products(db, "ap")) == ["Apples", "Apricots", "Carrots"]
+    assert names(search_products(db, "apr")) == ["Apricots"]
+
+
+def test_limit(db):
+    seed(db)
+    assert len(search_products(db, "ap", limit=2)) == 2
+    assert len(search_products(db, "ap", limit=1)) == 1
+
+
+def test_endpoint_validates_limit(client, db):
+    seed(db)
+    response = client.get("/buyer/products/search", params={"query": "apr"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()] == ["Apricots"]
+    assert client.get("/buyer/products/search", params={"query": "ap", "limit": 0}).status_code == 422
+
+
+def test_rename_is_searchable_by_new_name_only(db):
+    apples = seed(db)[0]
+    apples.name = "Pears"
+    db.commit()
+
+    assert names(search_products(db, "pears")) == ["Pears"]
+    # "apples" still appears in two descriptions, but not in a name
+    assert names(search_products(db, "apples")) == ["Carrots", "Pears"]
+    apples.description = "Juicy"
+    db.commit()
+    assert names(search_products(db, "apples")) == ["Carrots"]
+
+
+def test_deleted_product_drops_out(db):
+    apricots = seed(db)[1]
+    db.delete(apricots)
+    db.commit()
+    assert search_products(db, "apricots") == []
+    assert names(search_products(db, "ap")) == ["Apples", "Carrots"]
+
+
+def test_stock_update_does_not_touch_the_index(db):
+    apples = seed(db)[0]
+    before = total_changes(db)
+    db.query(Product).filter(Product.id == apples.id).update({Product.quantity: 3})
+    db.flush()
+    assert total_changes(db) - before == 1
+
+    before = total_changes(db)
+    db.query(Product).filter(Product.id == apples.id).update({Product.name: "Green apples"})
+    db.flush()
+    # The products row plus the FTS delete and insert
+    assert total_changes(db) - before > 1
+    db.commit()
+    assert names(search_products(db, "green")) == ["Green apples"]
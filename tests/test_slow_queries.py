@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+import slow_queries
+from crud import get_user_by_email
+from metrics import MetricsMiddleware
+from models import User
+from slow_queries import describe_parameters, explain, slow_query_log
+from tests.conftest import create_test_app
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_SECONDS", 0.0)
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+def test_parameters_are_logged_as_types_only():
+    assert describe_parameters(("secret@example.com", 3, None)) == ["str", "int", "NoneType"]
+    assert describe_parameters({"email": "secret@example.com"}) == {"email": "str"}
+
+
+def test_slow_query_records_caller_and_redacted_parameters(db, log_everything):
+    get_user_by_email(db, "secret@example.com")
+    entry = next(entry for entry in log_everything.entries() if "FROM users" in entry["statement"])
+    assert entry["caller"] == "crud.get_user_by_email"
+    assert "secret@example.com" not in repr(entry)
+    assert entry["parameters"][0] == "str"
+    assert entry["route"] is None and entry["plan"] is None
+
+
+def test_slow_query_records_route_template(db, log_everything):
+    app = create_test_app()
+    app.add_middleware(MetricsMiddleware)
+    with TestClient(app) as client:
+        assert client.get("/buyer/products/42").status_code == 404
+    routes = {entry["route"] for entry in log_everything.entries()}
+    assert "GET /buyer/products/{product_id}" in routes
+
+
+def test_sampled_sqlite_plan(db, log_everything, monkeypatch):
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+    db.add(User(name="A", email="a@example.com", password="x"))
+    db.commit()
+    log_everything.clear()
+    get_user_by_email(db, "a@example.com")
+    entry = next(entry for entry in log_everything.entries() if "FROM users" in entry["statement"])
+    assert "USING INDEX" in entry["plan"]
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+
+    def fetchall(self):
+        return [("Seq Scan on products",)]
+
+
+class PostgresConnection:
+    class dialect:
+        name = "postgresql"
+
+
+@pytest.mark.parametrize("statement, expected", [
+    ("SELECT * FROM products", [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM products",
+        "RELEASE SAVEPOINT slow_query_explain",
+    ]),
+    # A CTE can modify data, so it must not be executed again by ANALYZE
+    ("WITH gone AS (DELETE FROM products RETURNING id) SELECT count(*) FROM gone", [
+        "EXPLAIN WITH gone AS (DELETE FROM products RETURNING id) SELECT count(*) FROM gone",
+    ]),
+    ("UPDATE products SET quantity = 0", []),
+])
+def test_postgres_plans_only_analyze_plain_selects(statement, expected):
+    cursor = RecordingCursor()
+    plan = explain(PostgresConnection(), cursor, statement, {})
+    assert cursor.executed == expected
+    assert (plan is None) == (not expected)
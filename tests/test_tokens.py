@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from jose import jwt
+import tokens
+from models import TokenRevocation
+from tokens import (
+    JWT_ALGORITHM, InvalidTokenError, KeyRing, RevocationFilter, create_access_token, decode_access_token,
+    jti_key, refresh_revocations, revoke_subject
+)
+from tests.factories import make_buyer
+
+
+def token_issued_at(email: str, issued_at: datetime, kid: str = None):
+    active_kid, key = tokens.key_ring.active()
+    claims = {"sub": email, "iat": issued_at, "exp": issued_at + timedelta(hours=1), "jti": uuid.uuid4().hex}
+    return jwt.encode(claims, key, algorithm=JWT_ALGORITHM, headers={"kid": kid or active_kid})
+
+
+def get_user(client, token: str):
+    return client.get("/auth/user", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_subject_revocation_only_rejects_earlier_tokens(client, db):
+    make_buyer(db, "buyer@example.com")
+    db.commit()
+    now = datetime.utcnow()
+    before = token_issued_at("buyer@example.com", now - timedelta(minutes=2))
+    after = token_issued_at("buyer@example.com", now)
+
+    revoke_subject(db, "buyer@example.com")
+    db.flush()
+    db.query(TokenRevocation).one().revoked_at = now - timedelta(minutes=1)
+    db.commit()
+
+    response = get_user(client, before)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    assert get_user(client, after).status_code == 200
+
+
+def test_subject_revocation_survives_a_filter_refresh(client, db):
+    make_buyer(db, "buyer@example.com")
+    db.commit()
+    token = token_issued_at("buyer@example.com", datetime.utcnow() - timedelta(minutes=1))
+    revoke_subject(db, "buyer@example.com")
+    db.commit()
+
+    refresh_revocations(db)
+    refresh_revocations(db)
+    assert get_user(client, token).status_code == 401
+
+
+def test_local_revocation_survives_replace():
+    revocations = RevocationFilter()
+    revocations.add(jti_key("abc"))
+    # The refresh's query ran before the revoking transaction committed
+    revocations.replace([])
+    assert revocations.might_contain(jti_key("abc"))
+
+    # By the next refresh the row is committed and comes back from the table
+    revocations.replace([jti_key("abc")])
+    assert revocations.might_contain(jti_key("abc"))
+    assert not revocations.might_contain(jti_key("other"))
+
+
+def test_rotated_out_kid_still_verifies(monkeypatch):
+    config = {"active": "old", "keys": {"old": "old-secret"}}
+    monkeypatch.setattr(tokens, "key_ring", KeyRing(loader=lambda: (config["active"], dict(config["keys"])), ttl=0))
+    old_token = create_access_token({"sub": "buyer@example.com"})
+
+    config.update(active="new", keys={"old": "old-secret", "new": "new-secret"})
+    new_token = create_access_token({"sub": "buyer@example.com"})
+    assert jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert decode_access_token(old_token)["sub"] == "buyer@example.com"
+    assert decode_access_token(new_token)["sub"] == "buyer@example.com"
+
+    # Retiring the kid from the file ends its tokens
+    config["keys"].pop("old")
+    with pytest.raises(InvalidTokenError):
+        decode_access_token(old_token)
+
+
+def test_unknown_kid_is_rejected(client, db):
+    make_buyer(db, "buyer@example.com")
+    db.commit()
+    token = token_issued_at("buyer@example.com", datetime.utcnow(), kid="retired")
+
+    response = get_user(client, token)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token"
@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from jose import jwt, JWTError
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import AuthSession, TokenRevocation, User
+
+# Access token issuing and verification.
+# Signing keys are identified by `kid` and cached; tokens signed with any known key verify, new tokens
+# use the active one, so keys rotate by adding a new kid, switching JWT_ACTIVE_KID, and retiring the
+# old kid once its tokens have expired. JWT_KEYS_FILE points at a JSON file
+# {"active": "<kid>", "keys": {"<kid>": "<secret>"}} that is re-read every JWT_KEY_CACHE_SECONDS;
+# without it a single key comes from JWT_SECRET_KEY.
+# Revocations live in the token_revocations table and are mirrored into an in-memory bloom filter
+# refreshed every TOKEN_REVOCATION_REFRESH_SECONDS, so only tokens that hit the filter cost a DB lookup.
+# Revocations written by another worker take effect here at the next refresh.
+# Refresh tokens are opaque random strings backed by auth_sessions rows looked up by hash; each use
+# rotates the token, and presenting an already rotated token ends every session of that login.
+# Rotated rows are only kept for REFRESH_TOKEN_REUSE_WINDOW_HOURS; a token replayed after that is
+# simply unknown, so the table holds about one row per live login rather than one per refresh.
+
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key")
+JWT_ACTIVE_KID = os.environ.get("JWT_ACTIVE_KID", "default")
+JWT_KEYS_FILE = os.environ.get("JWT_KEYS_FILE", "")
+JWT_KEY_CACHE_SECONDS = float(os.environ.get("JWT_KEY_CACHE_SECONDS", "300"))
+# Longest lifetime of any token we issue; revocations are kept this long
+JWT_MAX_TOKEN_MINUTES = int(os.environ.get("JWT_MAX_TOKEN_MINUTES", "1440"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_TOKEN_REUSE_WINDOW_HOURS = float(os.environ.get("REFRESH_TOKEN_REUSE_WINDOW_HOURS", "24"))
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.environ.get("TOKEN_REVOCATION_REFRESH_SECONDS", "30"))
+REVOCATION_FILTER_ERROR_RATE = 0.001
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class InvalidRefreshTokenError(Exception):
+    pass
+
+
+def load_env_keys():
+    if JWT_KEYS_FILE:
+        with open(JWT_KEYS_FILE) as keys_file:
+            config = json.load(keys_file)
+        return config["active"], config["keys"]
+    return JWT_ACTIVE_KID, {JWT_ACTIVE_KID: JWT_SECRET_KEY}
+
+
+class KeyRing:
+    def __init__(self, loader=load_env_keys, ttl: float = JWT_KEY_CACHE_SECONDS):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._active = None
+        self._keys = {}
+        self._loaded_at = None
+
+    def _load(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            # A forced reload for an unknown kid is still rate limited, so junk kids can't hammer the loader
+            min_age = 1.0 if force else self.ttl
+            if self._loaded_at is None or now - self._loaded_at >= min_age:
+                self._active, self._keys = self.loader()
+                self._loaded_at = now
+            return self._active, self._keys
+
+    def active(self):
+        kid, keys = self._load()
+        return kid, keys[kid]
+
+    def get(self, kid: str):
+        key = self._load()[1].get(kid)
+        if key is None:
+            key = self._load(force=True)[1].get(kid)
+        return key
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = REVOCATION_FILTER_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big")
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+def jti_key(jti: str):
+    return f"jti:{jti}"
+
+
+def subject_key(subject: str):
+    return f"sub:{subject}"
+
+
+class RevocationFilter:
+    def __init__(self):
+        self._filter = BloomFilter(0)
+        self._lock = threading.Lock()
+        # Local revocations since the last rebuild, which the rebuild's query may not have seen committed
+        self._added = []
+
+    def add(self, key: str):
+        with self._lock:
+            self._filter.add(key)
+            self._added.append(key)
+
+    def might_contain(self, key: str):
+        return key in self._filter
+
+    def replace(self, keys):
+        # Sized with headroom for revocations added locally before the next refresh
+        rebuilt = BloomFilter(len(keys) * 2 + 1024)
+        for key in keys:
+            rebuilt.add(key)
+        with self._lock:
+            for key in self._added:
+                rebuilt.add(key)
+            self._added = []
+            self._filter = rebuilt
+
+
+key_ring = KeyRing()
+revocation_filter = RevocationFilter()
+
+
+def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
+    """
+    Create a JWT token with the given data and expiration time.
+    """
+    kid, key = key_ring.active()
+    now = datetime.utcnow()
+    to_encode = data.copy()
+    to_encode.update({"exp": now + expires_delta, "iat": now, "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, key, algorithm=JWT_ALGORITHM, headers={"kid": kid})
+
+
+def decode_access_token(token: str):
+    try:
+        # Tokens issued before kids were introduced carry none and were signed with the default key
+        kid = jwt.get_unverified_header(token).get("kid", JWT_ACTIVE_KID)
+        key = key_ring.get(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown signing key")
+        return jwt.decode(token, key, algorithms=[JWT_ALGORITHM])
+    except JWTError as e:
+        raise InvalidTokenError(str(e))
+
+
+def is_revoked(db: Session, payload: dict):
+    jti, subject = payload.get("jti"), payload.get("sub")
+    if not (jti and revocation_filter.might_contain(jti_key(jti))) and not revocation_filter.might_contain(subject_key(subject)):
+        return False
+    # Filter hit: either revoked or a false positive, the table decides
+    issued_at = datetime.utcfromtimestamp(payload.get("iat", 0))
+    conditions = [(TokenRevocation.subject == subject) & (TokenRevocation.revoked_at >= issued_at)]
+    if jti:
+        conditions.append(TokenRevocation.jti == jti)
+    return db.query(TokenRevocation.id).filter(or_(*conditions)).first() is not None
+
+
+def revoke_token(db: Session, jti: str, expires_at: datetime):
+    """Revoke one token. Runs in the caller's transaction; the caller commits."""
+    db.add(TokenRevocation(jti=jti, revoked_at=datetime.utcnow(), expires_at=expires_at))
+    revocation_filter.add(jti_key(jti))
+
+
+def revoke_subject(db: Session, subject: str):
+    """Revoke every token issued to `subject` so far. Runs in the caller's transaction."""
+    now = datetime.utcnow()
+    db.add(TokenRevocation(subject=subject, revoked_at=now, expires_at=now + timedelta(minutes=JWT_MAX_TOKEN_MINUTES)))
+    revocation_filter.add(subject_key(subject))
+
+
+def hash_refresh_token(token: str):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def new_refresh_session(user_id: int, family_id: str = None):
+    """
+    Create a refresh token and its session row. The caller adds the row to its (sync or async)
+    session and commits, then hands the token to the client.
+    """
+    token = secrets.token_urlsafe(32)
+    session = AuthSession(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return token, session
+
+
+def issue_refresh_token(db: Session, user_id: int):
+    token, session = new_refresh_session(user_id)
+    db.add(session)
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str):
+    """
+    Exchange a refresh token for a new one in the same family. Returns (user, new token).
+    One indexed lookup and a conditional UPDATE; no credential check.
+    """
+    row = (
+        db.query(AuthSession, User)
+        .join(User, User.id == AuthSession.user_id)
+        .filter(AuthSession.token_hash == hash_refresh_token(token))
+        .first()
+    )
+    now = datetime.utcnow()
+    if row is None or row[0].expires_at < now:
+        raise InvalidRefreshTokenError("Invalid refresh token")
+    session, user = row
+    # Claiming the row makes concurrent uses of the same token race for a single winner
+    claimed = db.execute(
+        update(AuthSession)
+        .where(AuthSession.id == session.id, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        # A rotated or revoked token came back: assume it leaked and end the whole login
+        revoke_session_family(db, session.family_id)
+        db.commit()
+        raise InvalidRefreshTokenError("Refresh token has already been used")
+    new_token, new_session = new_refresh_session(user.id, session.family_id)
+    db.add(new_session)
+    # Keep the loaded user readable after commit without another SELECT
+    db.expunge(user)
+    db.commit()
+    return user, new_token
+
+
+def revoke_session_family(db: Session, family_id: str):
+    """Runs in the caller's transaction; the caller commits."""
+    db.execute(
+        update(AuthSession)
+        .where(AuthSession.family_id == family_id, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def revoke_refresh_token(db: Session, token: str):
+    family_id = db.query(AuthSession.family_id).filter(AuthSession.token_hash == hash_refresh_token(token)).scalar()
+    if family_id is not None:
+        revoke_session_family(db, family_id)
+
+
+def revoke_user_sessions(db: Session, user_id: int):
+    """Runs in the caller's transaction; the caller commits."""
+    db.execute(
+        update(AuthSession)
+        .where(AuthSession.user_id == user_id, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_revocations(db: Session, now: datetime = None):
+    now = now or datetime.utcnow()
+    db.query(TokenRevocation).filter(TokenRevocation.expires_at < now).delete(synchronize_session=False)
+    db.query(AuthSession).filter(AuthSession.expires_at < now).delete(synchronize_session=False)
+    reuse_cutoff = now - timedelta(hours=REFRESH_TOKEN_REUSE_WINDOW_HOURS)
+    db.query(AuthSession).filter(AuthSession.revoked_at < reuse_cutoff).delete(synchronize_session=False)
+    db.commit()
+    rows = db.query(TokenRevocation.jti, TokenRevocation.subject).all()
+    revocation_filter.replace([jti_key(jti) if jti else subject_key(subject) for jti, subject in rows])
+    return len(rows)
+
+
+def load_revocations():
+    db = SessionLocal()
+    try:
+        refresh_revocations(db)
+    finally:
+        db.close()
+
+
+async def run_revocation_refresher(interval: float = TOKEN_REVOCATION_REFRESH_SECONDS):
+    # The filter is loaded once at startup; this keeps it in step with other workers
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(load_revocations)
+        except Exception:
+            logger.exception("Token revocation refresh failed")